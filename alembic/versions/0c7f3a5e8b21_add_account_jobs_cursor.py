@@ -0,0 +1,26 @@
+"""add account_jobs cursor
+
+Revision ID: 0c7f3a5e8b21
+Revises: 6d2b8e4f9a13
+Create Date: 2026-10-18 10:12:44.908162
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0c7f3a5e8b21"
+down_revision: Union[str, None] = "6d2b8e4f9a13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("account_jobs", sa.Column("cursor", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("account_jobs", "cursor")
@@ -0,0 +1,39 @@
+"""add posts (created_at, id) index for keyset pagination
+
+Revision ID: 3f1c2a9d8b71
+Revises: 
+Create Date: 2026-10-16 09:12:44.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f1c2a9d8b71"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Build without blocking inserts into posts
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_posts_created_at_id",
+            "posts",
+            ["created_at", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_posts_created_at_id",
+            table_name="posts",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,32 @@
+"""create counter_flushes table
+
+Revision ID: 5e1d9c7b3a48
+Revises: 0c7f3a5e8b21
+Create Date: 2026-10-18 11:03:27.514390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5e1d9c7b3a48"
+down_revision: Union[str, None] = "0c7f3a5e8b21"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "counter_flushes",
+        sa.Column("generation", sa.String(), nullable=False),
+        sa.Column("first_id", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("generation", "first_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("counter_flushes")
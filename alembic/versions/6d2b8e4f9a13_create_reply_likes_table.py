@@ -0,0 +1,34 @@
+"""create reply_likes table
+
+Revision ID: 6d2b8e4f9a13
+Revises: a9e2c7d41b5f
+Create Date: 2026-10-17 19:42:08.315274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6d2b8e4f9a13"
+down_revision: Union[str, None] = "a9e2c7d41b5f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "reply_likes",
+        sa.Column("reply_id", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["reply_id"], ["replies.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("reply_id", "user_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("reply_likes")
@@ -0,0 +1,38 @@
+"""create follows table
+
+Revision ID: 8a4e07c5d2f3
+Revises: 3f1c2a9d8b71
+Create Date: 2026-10-16 11:40:02.917533
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8a4e07c5d2f3"
+down_revision: Union[str, None] = "3f1c2a9d8b71"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "follows",
+        sa.Column("follower_id", sa.Uuid(), nullable=False),
+        sa.Column("followee_id", sa.Uuid(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["follower_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["followee_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("follower_id", "followee_id"),
+    )
+    op.create_index(
+        op.f("ix_follows_followee_id"), "follows", ["followee_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_follows_followee_id"), table_name="follows")
+    op.drop_table("follows")
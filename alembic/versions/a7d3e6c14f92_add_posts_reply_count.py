@@ -0,0 +1,47 @@
+"""add posts reply_count and last_reply_at
+
+Revision ID: a7d3e6c14f92
+Revises: e93d4f1b6a58
+Create Date: 2026-10-17 10:02:37.519346
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7d3e6c14f92"
+down_revision: Union[str, None] = "e93d4f1b6a58"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant default is stored in the catalog, no table rewrite
+    op.add_column(
+        "posts",
+        sa.Column("reply_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "posts",
+        sa.Column("last_reply_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.execute(
+        """
+        UPDATE posts
+        SET reply_count = counts.reply_count, last_reply_at = counts.last_reply_at
+        FROM (
+            SELECT post_id, count(*) AS reply_count, max(created_at) AS last_reply_at
+            FROM replies
+            GROUP BY post_id
+        ) AS counts
+        WHERE posts.id = counts.post_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("posts", "last_reply_at")
+    op.drop_column("posts", "reply_count")
@@ -0,0 +1,62 @@
+"""create account_jobs table and replies (user_id) index
+
+Revision ID: a9e2c7d41b5f
+Revises: f1a6b3c8d2e4
+Create Date: 2026-10-17 17:26:13.540982
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a9e2c7d41b5f"
+down_revision: Union[str, None] = "f1a6b3c8d2e4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "account_jobs",
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column(
+            "action",
+            postgresql.ENUM(name="user_status", create_type=False),
+            nullable=False,
+        ),
+        sa.Column("step", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("sessions_revoked", sa.Integer(), nullable=False),
+        sa.Column("replies_deleted", sa.Integer(), nullable=False),
+        sa.Column("likes_removed", sa.Integer(), nullable=False),
+        sa.Column("posts_deleted", sa.Integer(), nullable=False),
+        sa.Column("follows_removed", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    # Lets the account worker find a user's replies without scanning them all
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_replies_user_id",
+            "replies",
+            ["user_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_replies_user_id",
+            table_name="replies",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_table("account_jobs")
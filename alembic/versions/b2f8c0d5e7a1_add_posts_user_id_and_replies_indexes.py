@@ -0,0 +1,52 @@
+"""add posts (user_id) and replies (post_id, created_at, id) indexes
+
+Revision ID: b2f8c0d5e7a1
+Revises: a7d3e6c14f92
+Create Date: 2026-10-17 10:04:51.206118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b2f8c0d5e7a1"
+down_revision: Union[str, None] = "a7d3e6c14f92"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Build without blocking writes to posts and replies
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_posts_user_id",
+            "posts",
+            ["user_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_replies_post_id_created_at",
+            "replies",
+            ["post_id", "created_at", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_replies_post_id_created_at",
+            table_name="replies",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_posts_user_id",
+            table_name="posts",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
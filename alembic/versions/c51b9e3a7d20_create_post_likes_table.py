@@ -0,0 +1,34 @@
+"""create post_likes table
+
+Revision ID: c51b9e3a7d20
+Revises: 8a4e07c5d2f3
+Create Date: 2026-10-16 14:05:37.602118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c51b9e3a7d20"
+down_revision: Union[str, None] = "8a4e07c5d2f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "post_likes",
+        sa.Column("post_id", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["post_id"], ["posts.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("post_id", "user_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("post_likes")
@@ -0,0 +1,44 @@
+"""add users post, follower and following counters
+
+Revision ID: d4c9a2e7f3b6
+Revises: b2f8c0d5e7a1
+Create Date: 2026-10-17 13:41:08.662409
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4c9a2e7f3b6"
+down_revision: Union[str, None] = "b2f8c0d5e7a1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Constant defaults are stored in the catalog, no table rewrite
+    for column in ("post_count", "follower_count", "following_count"):
+        op.add_column(
+            "users",
+            sa.Column(column, sa.Integer(), server_default="0", nullable=False),
+        )
+    op.execute(
+        """
+        UPDATE users
+        SET post_count = (SELECT count(*) FROM posts WHERE posts.user_id = users.id),
+            follower_count = (
+                SELECT count(*) FROM follows WHERE follows.followee_id = users.id
+            ),
+            following_count = (
+                SELECT count(*) FROM follows WHERE follows.follower_id = users.id
+            )
+        """
+    )
+
+
+def downgrade() -> None:
+    for column in ("following_count", "follower_count", "post_count"):
+        op.drop_column("users", column)
@@ -0,0 +1,83 @@
+"""add posts full-text search vector and drop content b-tree indexes
+
+Revision ID: e93d4f1b6a58
+Revises: c51b9e3a7d20
+Create Date: 2026-10-16 16:21:09.144873
+
+Adding a stored generated column rewrites the posts table under an ACCESS
+EXCLUSIVE lock; schedule this revision in a maintenance window on large
+tables. The indexes are built and dropped concurrently.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e93d4f1b6a58"
+down_revision: Union[str, None] = "c51b9e3a7d20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "posts",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('simple', content)", persisted=True),
+            nullable=True,
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_posts_search_vector",
+            "posts",
+            ["search_vector"],
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # B-trees over unbounded text: unusable for search, costly on every
+        # write and rejected once a row exceeds the index tuple size limit
+        op.drop_index(
+            "ix_posts_content",
+            table_name="posts",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_replies_content",
+            table_name="replies",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_replies_content",
+            "replies",
+            ["content"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_posts_content",
+            "posts",
+            ["content"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            "ix_posts_search_vector",
+            table_name="posts",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column("posts", "search_vector")
@@ -0,0 +1,50 @@
+"""create media_blobs and media tables
+
+Revision ID: f1a6b3c8d2e4
+Revises: d4c9a2e7f3b6
+Create Date: 2026-10-17 15:02:44.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f1a6b3c8d2e4"
+down_revision: Union[str, None] = "d4c9a2e7f3b6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "media_blobs",
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("content_type", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("sha256"),
+    )
+    op.create_table(
+        "media",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column("sha256", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["sha256"], ["media_blobs.sha256"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_media_sha256"), "media", ["sha256"], unique=False)
+    op.create_index(
+        "ix_media_user_id_sha256", "media", ["user_id", "sha256"], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_media_user_id_sha256", table_name="media")
+    op.drop_index(op.f("ix_media_sha256"), table_name="media")
+    op.drop_table("media")
+    op.drop_table("media_blobs")
@@ -0,0 +1,489 @@
+import asyncio
+import logging
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+from redis.asyncio import Redis
+from sqlalchemy import bindparam, delete, func, or_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import desc, select
+
+from app.config import get_settings
+from app.database import async_session, close_redis, init_redis
+from app.flushes import record_deltas_once
+from app.likes import POST_LIKES, REPLY_LIKES
+from app.models import (
+    AccountJob,
+    Follow,
+    Post,
+    PostLike,
+    Reply,
+    ReplyLike,
+    User,
+    UserStatus,
+)
+from app.profiles import invalidate_profiles
+from app.replies import PENDING_COUNTS_KEY
+from app.sessions import revoke_user_sessions
+from app.timeline import HEAVY_AUTHORS_KEY, author_timeline_key, home_timeline_key
+
+# Deleting or deactivating an account only flips users.status and records a
+# job in the same transaction; everything else happens here, in the account
+# worker (python -m app.accounts). Each batch is one short transaction that
+# also records the job's progress, and deletes report the rows they removed,
+# so a job resumed after a crash (or run twice) never double counts.
+DELETION_STEPS = (
+    "sessions",
+    "replies",
+    "likes",
+    "timelines",
+    "posts",
+    "follows",
+    "account",
+)
+DEACTIVATION_STEPS = ("sessions", "timelines")
+
+users_table = User.__table__
+
+# Core statements so a list of parameters runs as a single executemany
+_decrement_follower_counts = (
+    update(users_table)
+    .where(users_table.c.id == bindparam("b_user_id"))
+    .values(follower_count=users_table.c.follower_count - bindparam("b_count"))
+)
+_decrement_following_counts = (
+    update(users_table)
+    .where(users_table.c.id == bindparam("b_user_id"))
+    .values(following_count=users_table.c.following_count - bindparam("b_count"))
+)
+
+
+def job_steps(action: UserStatus) -> tuple[str, ...]:
+    return DELETION_STEPS if action == UserStatus.deleted else DEACTIVATION_STEPS
+
+
+async def start_account_job(db: AsyncSession, user_id: uuid.UUID, action: UserStatus):
+    """Flip the account's status and (re)start its job; the caller commits."""
+    now = datetime.now(timezone.utc)
+    await db.execute(update(User).where(User.id == user_id).values(status=action))
+    job = {
+        "action": action,
+        "step": job_steps(action)[0],
+        "cursor": None,
+        "updated_at": now,
+        "finished_at": None,
+        "lease_expires_at": None,
+    }
+    await db.execute(
+        insert(AccountJob)
+        .values(user_id=user_id, created_at=now, **job)
+        .on_conflict_do_update(index_elements=["user_id"], set_=job)
+    )
+
+
+async def _record_progress(db: AsyncSession, user_id: uuid.UUID, **counts: int) -> None:
+    # Committed with the batch it counts, and renews the worker's lease
+    now = datetime.now(timezone.utc)
+    await db.execute(
+        update(AccountJob)
+        .where(AccountJob.user_id == user_id)
+        .values(
+            updated_at=now,
+            lease_expires_at=now
+            + timedelta(seconds=get_settings().account_jobs_lease_seconds),
+            **{
+                name: getattr(AccountJob, name) + count
+                for name, count in counts.items()
+            },
+        )
+    )
+
+
+async def _decrement(db: AsyncSession, statement, key: str, counts: Counter):
+    if counts:
+        # Sorted so concurrent writers always lock rows in the same order
+        await db.execute(
+            statement,
+            [
+                {key: row_id, "b_count": count}
+                for row_id, count in sorted(counts.items())
+            ],
+        )
+
+
+async def revoke_sessions(redis: Redis, job: AccountJob) -> bool:
+    revoked = await revoke_user_sessions(redis, job.user_id)
+    async with async_session() as db:
+        username = await db.scalar(select(User.username).where(User.id == job.user_id))
+        await _record_progress(db, job.user_id, sessions_revoked=revoked)
+        await db.commit()
+    await invalidate_profiles(redis, username)
+    return False
+
+
+async def delete_replies(redis: Redis, job: AccountJob) -> bool:
+    batch_size = get_settings().account_jobs_batch_size
+    async with async_session() as db:
+        rows = (
+            await db.execute(
+                select(Reply.id, Reply.post_id)
+                .where(Reply.user_id == job.user_id)
+                .order_by(Reply.id)
+                .limit(batch_size)
+                .with_for_update()
+            )
+        ).all()
+        counts = Counter(post_id for _, post_id in rows)
+        if rows:
+            # posts.reply_count is written behind (app.replies) and may not
+            # include these replies yet, so the pending count takes the
+            # decrement rather than the column
+            await record_deltas_once(
+                redis,
+                _marker_key(job, "replies", rows[0].id),
+                PENDING_COUNTS_KEY,
+                {post_id: -count for post_id, count in counts.items()},
+            )
+            await db.execute(
+                delete(Reply)
+                .where(Reply.id.in_([reply_id for reply_id, _ in rows]))
+                .execution_options(synchronize_session=False)
+            )
+            last_reply_at = (
+                select(func.max(Reply.created_at))
+                .where(Reply.post_id == Post.id)
+                .scalar_subquery()
+            )
+            await db.execute(
+                update(Post)
+                .where(Post.id.in_(sorted(counts)))
+                .values(last_reply_at=last_reply_at)
+                .execution_options(synchronize_session=False)
+            )
+        await _record_progress(db, job.user_id, replies_deleted=len(rows))
+        await db.commit()
+    return len(rows) == batch_size
+
+
+def _marker_key(job: AccountJob, kind: str, first_id: str) -> str:
+    return f"account-jobs:{job.user_id}:{kind}:{first_id}"
+
+
+async def remove_likes(redis: Redis, job: AccountJob) -> bool:
+    batch_size = get_settings().account_jobs_batch_size
+    async with async_session() as db:
+        # Locked in a stable order, so a batch retried after a crash is the
+        # same batch and its decrements are not recorded twice
+        post_ids = (
+            await db.scalars(
+                select(PostLike.post_id)
+                .where(PostLike.user_id == job.user_id)
+                .order_by(PostLike.post_id)
+                .limit(batch_size)
+                .with_for_update()
+            )
+        ).all()
+        reply_ids = (
+            await db.scalars(
+                select(ReplyLike.reply_id)
+                .where(ReplyLike.user_id == job.user_id)
+                .order_by(ReplyLike.reply_id)
+                .limit(batch_size)
+                .with_for_update()
+            )
+        ).all()
+
+        # The likes columns are written behind, like any other unlike; the
+        # decrements are recorded before the rows go so none can be lost
+        if post_ids:
+            await record_deltas_once(
+                redis,
+                _marker_key(job, "likes", post_ids[0]),
+                POST_LIKES.pending_key,
+                dict.fromkeys(post_ids, -1),
+            )
+            await db.execute(
+                delete(PostLike)
+                .where(PostLike.user_id == job.user_id, PostLike.post_id.in_(post_ids))
+                .execution_options(synchronize_session=False)
+            )
+        if reply_ids:
+            await record_deltas_once(
+                redis,
+                _marker_key(job, "reply-likes", reply_ids[0]),
+                REPLY_LIKES.pending_key,
+                dict.fromkeys(reply_ids, -1),
+            )
+            await db.execute(
+                delete(ReplyLike)
+                .where(
+                    ReplyLike.user_id == job.user_id, ReplyLike.reply_id.in_(reply_ids)
+                )
+                .execution_options(synchronize_session=False)
+            )
+        await _record_progress(
+            db, job.user_id, likes_removed=len(post_ids) + len(reply_ids)
+        )
+        await db.commit()
+    return len(post_ids) == batch_size or len(reply_ids) == batch_size
+
+
+async def remove_from_timelines(redis: Redis, job: AccountJob) -> bool:
+    # Followers' home timelines hold at most the author's latest
+    # timeline_max_length posts; reads skip them anyway, this keeps pages
+    # from filling up with hidden entries
+    settings = get_settings()
+    batch_size = settings.account_jobs_batch_size
+    async with async_session() as db:
+        post_ids = (
+            await db.scalars(
+                select(Post.id)
+                .where(Post.user_id == job.user_id)
+                .order_by(desc(Post.created_at), desc(Post.id))
+                .limit(settings.timeline_max_length)
+            )
+        ).all()
+        query = (
+            select(Follow.follower_id)
+            .where(Follow.followee_id == job.user_id)
+            .order_by(Follow.follower_id)
+            .limit(batch_size)
+        )
+        if job.cursor:
+            query = query.where(Follow.follower_id > uuid.UUID(job.cursor))
+        follower_ids = (await db.scalars(query)).all()
+
+    if post_ids and follower_ids:
+        async with redis.pipeline(transaction=False) as pipe:
+            for follower_id in follower_ids:
+                pipe.zrem(home_timeline_key(follower_id), *post_ids)
+            await pipe.execute()
+
+    # Removing twice is harmless, so the cursor moves after Redis did
+    job.cursor = str(follower_ids[-1]) if follower_ids else None
+    async with async_session() as db:
+        await db.execute(
+            update(AccountJob)
+            .where(AccountJob.user_id == job.user_id)
+            .values(cursor=job.cursor)
+        )
+        await _record_progress(db, job.user_id)
+        await db.commit()
+    return len(follower_ids) == batch_size
+
+
+async def delete_posts(redis: Redis, job: AccountJob) -> bool:
+    batch_size = get_settings().account_jobs_batch_size
+    async with async_session() as db:
+        post_ids = (
+            await db.scalars(
+                select(Post.id).where(Post.user_id == job.user_id).limit(batch_size)
+            )
+        ).all()
+    if not post_ids:
+        return False
+
+    # Other users' replies first, in batches, so a busy thread does not
+    # become one long delete; likes go with their posts (ON DELETE CASCADE)
+    replies_deleted = batch_size
+    while replies_deleted == batch_size:
+        async with async_session() as db:
+            result = await db.execute(
+                delete(Reply)
+                .where(
+                    Reply.id.in_(
+                        select(Reply.id)
+                        .where(Reply.post_id.in_(post_ids))
+                        .limit(batch_size)
+                    )
+                )
+                .execution_options(synchronize_session=False)
+            )
+            replies_deleted = result.rowcount
+            await _record_progress(db, job.user_id, replies_deleted=replies_deleted)
+            await db.commit()
+
+    async with async_session() as db:
+        result = await db.execute(
+            delete(Post)
+            .where(Post.id.in_(post_ids))
+            .execution_options(synchronize_session=False)
+        )
+        await _record_progress(db, job.user_id, posts_deleted=result.rowcount)
+        await db.commit()
+    return len(post_ids) == batch_size
+
+
+async def remove_follows(redis: Redis, job: AccountJob) -> bool:
+    batch_size = get_settings().account_jobs_batch_size
+    async with async_session() as db:
+        followee_ids = (
+            await db.scalars(
+                delete(Follow)
+                .where(
+                    Follow.follower_id == job.user_id,
+                    Follow.followee_id.in_(
+                        select(Follow.followee_id)
+                        .where(Follow.follower_id == job.user_id)
+                        .limit(batch_size)
+                    ),
+                )
+                .returning(Follow.followee_id)
+                .execution_options(synchronize_session=False)
+            )
+        ).all()
+        follower_ids = (
+            await db.scalars(
+                delete(Follow)
+                .where(
+                    Follow.followee_id == job.user_id,
+                    Follow.follower_id.in_(
+                        select(Follow.follower_id)
+                        .where(Follow.followee_id == job.user_id)
+                        .limit(batch_size)
+                    ),
+                )
+                .returning(Follow.follower_id)
+                .execution_options(synchronize_session=False)
+            )
+        ).all()
+        await _decrement(
+            db, _decrement_follower_counts, "b_user_id", Counter(followee_ids)
+        )
+        await _decrement(
+            db, _decrement_following_counts, "b_user_id", Counter(follower_ids)
+        )
+        removed = len(followee_ids) + len(follower_ids)
+        await _record_progress(db, job.user_id, follows_removed=removed)
+        usernames = (
+            await db.scalars(
+                select(User.username).where(User.id.in_(followee_ids + follower_ids))
+            )
+        ).all()
+        await db.commit()
+    await invalidate_profiles(redis, *usernames)
+    return len(followee_ids) == batch_size or len(follower_ids) == batch_size
+
+
+async def delete_account(redis: Redis, job: AccountJob) -> bool:
+    # Media rows go with the user (ON DELETE CASCADE), blobs may be shared
+    async with async_session() as db:
+        username = await db.scalar(
+            delete(User)
+            .where(User.id == job.user_id)
+            .returning(User.username)
+            .execution_options(synchronize_session=False)
+        )
+        await _record_progress(db, job.user_id)
+        await db.commit()
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.delete(author_timeline_key(job.user_id))
+        pipe.srem(HEAVY_AUTHORS_KEY, str(job.user_id))
+        await pipe.execute()
+    await invalidate_profiles(redis, username)
+    return False
+
+
+# Each handler runs one batch and returns whether there is more to do
+STEP_HANDLERS: dict[str, Callable[[Redis, AccountJob], Awaitable[bool]]] = {
+    "sessions": revoke_sessions,
+    "replies": delete_replies,
+    "likes": remove_likes,
+    "timelines": remove_from_timelines,
+    "posts": delete_posts,
+    "follows": remove_follows,
+    "account": delete_account,
+}
+
+
+async def claim_job() -> Optional[AccountJob]:
+    now = datetime.now(timezone.utc)
+    async with async_session() as db:
+        job = (
+            await db.scalars(
+                select(AccountJob)
+                .where(
+                    AccountJob.finished_at.is_(None),
+                    or_(
+                        AccountJob.lease_expires_at.is_(None),
+                        AccountJob.lease_expires_at < now,
+                    ),
+                )
+                .order_by(AccountJob.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+        ).first()
+        if job is None:
+            return None
+        job.lease_expires_at = now + timedelta(
+            seconds=get_settings().account_jobs_lease_seconds
+        )
+        await db.commit()
+        return job
+
+
+async def _set_step(job: AccountJob, step: Optional[str]):
+    now = datetime.now(timezone.utc)
+    if step is None:
+        values = {"finished_at": now}
+    else:
+        values = {"step": step, "updated_at": now}
+        # A resumed step keeps its cursor, the next one starts over
+        if step != job.step:
+            job.step, job.cursor = step, None
+            values["cursor"] = None
+    async with async_session() as db:
+        await db.execute(
+            update(AccountJob)
+            .where(AccountJob.user_id == job.user_id, AccountJob.action == job.action)
+            .values(**values)
+        )
+        await db.commit()
+
+
+async def run_job(redis: Redis, job: AccountJob):
+    steps = job_steps(job.action)
+    for step in steps[steps.index(job.step) :]:
+        await _set_step(job, step)
+        while await STEP_HANDLERS[step](redis, job):
+            pass
+        logging.info(f"Account job {job.user_id} ({job.action.value}): {step} done")
+    await _set_step(job, None)
+
+
+async def process_next_job(redis: Redis) -> bool:
+    job = await claim_job()
+    if job is None:
+        return False
+    await run_job(redis, job)
+    return True
+
+
+async def run_account_worker():
+    redis = init_redis()
+    try:
+        while True:
+            try:
+                if not await process_next_job(redis):
+                    await asyncio.sleep(
+                        get_settings().account_jobs_poll_interval_seconds
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The job keeps its step and counts, and is picked up again
+                # once its lease expires
+                logging.error(f"Account job failed: {str(e)}")
+                await asyncio.sleep(1)
+    finally:
+        await close_redis()
+
+
+if __name__ == "__main__":
+    # python -m app.accounts
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_account_worker())
@@ -0,0 +1,188 @@
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+import orjson
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import get_settings
+from app.metrics import registry
+
+# Requests are admitted per route group, so a spike of feed queries waiting on
+# the database pool cannot starve logins and session checks. Within a group at
+# most `limit` requests run at once; a bounded queue absorbs bursts and anyone
+# who would wait longer than the deadline is turned away with a 503 while the
+# worker can still answer quickly
+HTTP_REQUESTS_SHED = "http_requests_shed_total"
+
+# First matching path prefix wins; None is never limited
+ROUTE_GROUPS: tuple[tuple[str, Optional[str]], ...] = (
+    ("/healthz", None),
+    ("/metrics", None),
+    ("/.well-known", None),
+    # Open for as long as the client listens, capped by LIVE_MAX_CLIENTS
+    ("/posts/stream", None),
+    ("/auth", "auth"),
+    ("/users/check-", "auth"),
+    ("/posts", "feed"),
+    ("/media", "media"),
+)
+DEFAULT_GROUP = "default"
+
+
+def route_group(path: str) -> Optional[str]:
+    for prefix, group in ROUTE_GROUPS:
+        if path.startswith(prefix):
+            return group
+    return DEFAULT_GROUP
+
+
+class ConcurrencyLimiter:
+    """Concurrency limit with a bounded FIFO queue of waiting requests.
+
+    With a latency target the limit adapts between 1 and max_limit: it shrinks
+    by a tenth while the average latency is above the target, and grows by one
+    while requests had to queue and latency is within it.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        max_queue: int,
+        max_wait: float,
+        latency_target: Optional[float] = None,
+    ):
+        self.limit = max_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.waiters: deque[asyncio.Future] = deque()
+        self.latency: Optional[float] = None
+        self.completed = 0
+        self.queued_since_adjust = False
+
+    async def acquire(self) -> bool:
+        if self.in_flight < self.limit and not self.waiters:
+            self.in_flight += 1
+            return True
+        if len(self.waiters) >= self.max_queue or self.max_wait <= 0:
+            return False
+
+        self.queued_since_adjust = True
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            # Unlike wait_for, wait leaves the future alone on timeout, so a
+            # slot handed over at the last moment is not lost
+            await asyncio.wait((waiter,), timeout=self.max_wait)
+        except BaseException:
+            # Cancelled while queued (client gone): give back a granted slot
+            if waiter.done():
+                self.release()
+            else:
+                self.waiters.remove(waiter)
+            raise
+        if waiter.done():
+            return True
+        self.waiters.remove(waiter)
+        return False
+
+    def release(self, latency: Optional[float] = None):
+        self.in_flight -= 1
+        if latency is not None and self.latency_target:
+            self._adapt(latency)
+        while self.waiters and self.in_flight < self.limit:
+            # The slot passes straight to the longest waiting request
+            self.waiters.popleft().set_result(None)
+            self.in_flight += 1
+
+    def _adapt(self, latency: float):
+        self.latency = (
+            latency if self.latency is None else 0.9 * self.latency + 0.1 * latency
+        )
+        self.completed += 1
+        if self.completed < self.limit:
+            return
+        if self.latency > self.latency_target:
+            self.limit = max(1, int(self.limit * 0.9))
+        elif self.queued_since_adjust:
+            self.limit = min(self.max_limit, self.limit + 1)
+        self.completed = 0
+        self.queued_since_adjust = False
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+        }
+
+
+def build_limiters() -> dict[str, ConcurrencyLimiter]:
+    settings = get_settings()
+    return {
+        group: ConcurrencyLimiter(
+            max_limit=limit,
+            max_queue=int(limit * settings.admission_queue_factor),
+            max_wait=settings.admission_max_wait_ms / 1000,
+            latency_target=(
+                settings.admission_latency_targets_ms[group] / 1000
+                if group in settings.admission_latency_targets_ms
+                else None
+            ),
+        )
+        for group, limit in settings.admission_limits.items()
+    }
+
+
+limiters = build_limiters()
+
+
+class AdmissionControlMiddleware:
+    """Pure ASGI middleware shedding requests its route group cannot take."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        group = route_group(scope["path"])
+        limiter = limiters.get(group) if group else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await limiter.acquire():
+            registry.inc(HTTP_REQUESTS_SHED, group=group)
+            await self.reject(send)
+            return
+
+        start_time = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - start_time)
+
+    async def reject(self, send: Send):
+        body = orjson.dumps({"detail": "Server is busy, retry later"})
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (
+                        b"retry-after",
+                        str(get_settings().admission_retry_after_seconds).encode(),
+                    ),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -1,9 +1,18 @@
-from fastapi import APIRouter
+import uuid
 
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import user_cache
+from app.database import get_session
+from app.dependencies import require_admin
+from app.models import AccountJob
+from app.rate_limit import throttled_requests
 
 router = APIRouter(
     prefix="/admin",
     tags=["admin"],
+    dependencies=[Depends(require_admin)],
     responses={418: {"description": "I'm a teapot"}},
 )
 
@@ -11,3 +20,24 @@ router = APIRouter(
 @router.post("/")
 async def update_admin():
     return {"message": "Admin getting schwifty"}
+
+
+@router.get("/cache")
+async def get_cache_stats():
+    return {"user_cache": user_cache.stats()}
+
+
+@router.get("/rate-limits")
+async def get_rate_limit_stats():
+    return {"throttled_requests": dict(throttled_requests)}
+
+
+@router.get("/account-jobs/{user_id}")
+async def get_account_job(user_id: uuid.UUID, db: AsyncSession = Depends(get_session)):
+    # Progress of an account deletion or deactivation
+    job = await db.get(AccountJob, user_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Account job not found"
+        )
+    return job
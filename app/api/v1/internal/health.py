@@ -0,0 +1,22 @@
+from fastapi import APIRouter, status
+from fastapi.responses import ORJSONResponse
+
+from app.warmup import readiness
+
+router = APIRouter(prefix="/healthz", tags=["health"])
+
+
+@router.get("/live", include_in_schema=False)
+async def live():
+    return {"status": "ok"}
+
+
+@router.get("/ready", include_in_schema=False)
+async def ready():
+    # Not ready until warmed up, and again once shutdown starts, so the load
+    # balancer only sends requests to workers with primed pools
+    if not readiness.ready:
+        return ORJSONResponse(
+            {"status": "starting"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    return {"status": "ready", "warmup_seconds": round(readiness.warmup_seconds, 3)}
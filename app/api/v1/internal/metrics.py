@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from redis.asyncio import Redis
+
+from app.database import get_redis
+from app.metrics import collect_worker_snapshots, render_prometheus
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics(redis: Redis = Depends(get_redis)):
+    snapshots = await collect_worker_snapshots(redis)
+    return PlainTextResponse(
+        render_prometheus(snapshots),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -2,11 +2,8 @@ import logging
 import uuid
 from typing import Annotated
 
-import resend
-import resend.exceptions
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Depends,
     HTTPException,
     Request,
@@ -19,41 +16,32 @@ from pydantic import (
     BaseModel,
     EmailStr,
 )
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
 
+from app.cache import invalidate_session
 from app.config import get_settings
-from app.database import r as redis
+from app.database import get_redis, get_session
 from app.dependencies import get_current_user, get_current_user_email
 from app.jwt import (
     create_login_token,
     decode_jwt,
 )
+from app.mailer import build_verification_email, enqueue_email
 from app.models import User
+from app.rate_limit import enforce_rate_limit, rate_limit_by_ip
+from app.sessions import (
+    create_session,
+    delete_session,
+    revoke_user_sessions,
+    session_expiry,
+    session_key,
+)
 from app.validators import email_validator
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-resend.api_key = get_settings().resend_api_key
-
-
-async def send_verification_email(to_email: str, token: str):
-    try:
-        login_url = f"{get_settings().web_app_url}/auth/verify?token={token}"
-        html = f"<p>Click the link below to log in:</p><br/><p><a href={login_url}>{login_url}</a></p><br/><p>This link will expire in {get_settings().verification_email_expiry_minutes} minutes.</p>"
-
-        params: resend.Emails.SendParams = {
-            "from": f"Connector <{get_settings().sender_email}>",
-            "to": [to_email],
-            "subject": "Log in to Connector",
-            "html": html,
-        }
-
-        resend.Emails.send(params)
-    except resend.exceptions.ResendError:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Email sending failed",
-        )
-
 
 class LoginRequestBody(BaseModel):
     email: Annotated[EmailStr, AfterValidator(email_validator)]
@@ -61,35 +49,38 @@ class LoginRequestBody(BaseModel):
 
 @router.post(
     "/login",
+    dependencies=[rate_limit_by_ip("login_ip")],
     responses={
         status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_429_TOO_MANY_REQUESTS: {"description": "Too Many Requests"},
         status.HTTP_500_INTERNAL_SERVER_ERROR: {"description": "Internal Server Error"},
     },
 )
 async def login(
     request: Request,
     request_body: LoginRequestBody,
-    background_tasks: BackgroundTasks,
+    redis: Redis = Depends(get_redis),
 ):
     try:
         session_id = request.cookies.get("session_id")
         if session_id:
-            current_user_email = redis.get(f"session:{session_id}")
-            if current_user_email:
+            if await redis.exists(session_key(session_id)):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="User already logged in",
                 )
 
         email = request_body.email
+        await enforce_rate_limit("login_email", email.lower())
+
         token = create_login_token(email)
-        background_tasks.add_task(
-            redis.setex,
+        await redis.setex(
             f"login:{email}",
             get_settings().verification_email_expiry_minutes * 60,
             token,
         )
-        background_tasks.add_task(send_verification_email, email, token)
+        # Delivered by the email worker (python -m app.mailer)
+        await enqueue_email(redis, build_verification_email(email, token))
         return {"message": "Successfully sent verification email"}
     except HTTPException:
         raise
@@ -103,18 +94,22 @@ async def login(
 
 @router.get(
     "/verify",
+    dependencies=[rate_limit_by_ip("verify_ip")],
+    responses={
+        status.HTTP_429_TOO_MANY_REQUESTS: {"description": "Too Many Requests"},
+    },
 )
 async def verify(
     token: str,
     request: Request,
     response: Response,
-    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_session),
+    redis: Redis = Depends(get_redis),
 ):
     try:
         session_id = request.cookies.get("session_id")
         if session_id:
-            current_user_email = redis.get(f"session:{session_id}")
-            if current_user_email:
+            if await redis.exists(session_key(session_id)):
                 return RedirectResponse(
                     url=f"{get_settings().web_app_url}/",
                     status_code=status.HTTP_302_FOUND,
@@ -125,22 +120,20 @@ async def verify(
             raise Exception("Invalid payload in token")
 
         email = payload["sub"]
-        session_token = str(redis.get(f"login:{email}"))
+        session_token = await redis.get(f"login:{email}")
         if not session_token:
             raise Exception("Login session expired")
 
-        background_tasks.add_task(redis.delete, f"login:{email}")
+        if not await redis.delete(f"login:{email}"):
+            raise Exception("Login session already used")
 
+        # Signed up users get a session bound to their id, so requests resolve
+        # them by primary key; new ones are bound when they create the account
+        user_query = await db.execute(select(User).where(User.email == email))
+        user = user_query.scalars().first()
         session_id = str(uuid.uuid4())
-        session_expiry = get_settings().session_expiry_days * 24 * 60 * 60
-
-        # Create session in Redis
-        background_tasks.add_task(
-            redis.setex,
-            f"session:{session_id}",
-            session_expiry,
-            email,
-        )
+        # Created before redirecting, so it exists when the client follows it
+        await create_session(redis, session_id, email, user)
 
         # Create redirect response with session cookie
         response = RedirectResponse(
@@ -153,7 +146,7 @@ async def verify(
             httponly=True,
             secure=True,
             samesite="strict",
-            max_age=session_expiry,
+            max_age=session_expiry(),
             domain=get_settings().cookie_domain,
         )
 
@@ -170,17 +163,30 @@ async def verify(
 async def logout(
     request: Request,
     response: Response,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
+    redis: Redis = Depends(get_redis),
 ):
     session_id = request.cookies.get("session_id")
     if session_id:
-        background_tasks.add_task(redis.delete, f"session:{session_id}")
+        await delete_session(redis, session_id, current_user.id)
+        await invalidate_session(redis, session_id)
 
     response.delete_cookie(key="session_id")
     return {"message": "Successfully logged out"}
 
 
+@router.post("/logout-all")
+async def logout_all(
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    redis: Redis = Depends(get_redis),
+):
+    revoked = await revoke_user_sessions(redis, current_user.id)
+
+    response.delete_cookie(key="session_id")
+    return {"message": "Successfully logged out everywhere", "sessions": revoked}
+
+
 @router.get("/check-user-logged-in")
 async def check_user_logged_in(
     current_user_email: EmailStr = Depends(get_current_user_email),
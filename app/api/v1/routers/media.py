@@ -0,0 +1,145 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+from starlette.requests import ClientDisconnect
+
+from app.config import get_settings
+from app.database import get_read_session, get_session
+from app.dependencies import get_current_user
+from app.ids import new_id
+from app.media import (
+    MediaTooLarge,
+    MediaTypeMismatch,
+    blob_key,
+    get_media_storage,
+    store_stream,
+)
+from app.models import Media, MediaBlob, User
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+
+@router.post(
+    "/",
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE: {"description": "Too Large"},
+        status.HTTP_415_UNSUPPORTED_MEDIA_TYPE: {"description": "Unsupported"},
+    },
+)
+async def upload_media(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+):
+    """Upload one file as the raw request body, typed by its Content-Type."""
+    settings = get_settings()
+    content_type = request.headers.get("content-type", "").split(";")[0]
+    content_type = content_type.strip().lower()
+    if content_type not in settings.media_allowed_types:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Unsupported media type",
+        )
+
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Media larger than {settings.media_max_bytes} bytes",
+    )
+    # Refuse a declared oversize body before reading any of it; chunked
+    # uploads are cut off by store_stream as soon as they pass the limit
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > settings.media_max_bytes:
+        raise too_large
+
+    storage = get_media_storage()
+    try:
+        sha256, size = await store_stream(
+            storage, request.stream(), settings.media_max_bytes, content_type
+        )
+    except MediaTooLarge:
+        raise too_large
+    except MediaTypeMismatch:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Content is not {content_type}",
+        )
+    except ClientDisconnect:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Upload interrupted"
+        )
+    except Exception as e:
+        logging.error(f"Failed to store media: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to upload media"
+        )
+    if size == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Empty upload"
+        )
+
+    try:
+        await db.execute(
+            insert(MediaBlob)
+            .values(sha256=sha256, size=size, content_type=content_type)
+            .on_conflict_do_nothing()
+        )
+        await db.execute(
+            insert(Media)
+            .values(id=new_id(), user_id=current_user.id, sha256=sha256)
+            .on_conflict_do_nothing(index_elements=["user_id", "sha256"])
+        )
+        media_id = await db.scalar(
+            select(Media.id).where(
+                Media.user_id == current_user.id, Media.sha256 == sha256
+            )
+        )
+        await db.commit()
+        return {
+            "media_id": media_id,
+            "url": storage.url(blob_key(sha256, content_type)),
+            "size": size,
+            "content_type": content_type,
+        }
+    except Exception as e:
+        await db.rollback()
+        logging.error(f"Failed to save media: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to upload media"
+        )
+
+
+@router.get(
+    "/{media_id}",
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_404_NOT_FOUND: {"description": "Not Found"},
+    },
+)
+async def get_media(
+    media_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_session),
+):
+    blob = (
+        await db.execute(
+            select(MediaBlob.sha256, MediaBlob.size, MediaBlob.content_type)
+            .join(Media, Media.sha256 == MediaBlob.sha256)
+            .where(Media.id == media_id)
+        )
+    ).first()
+    if blob is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Media not found"
+        )
+    return {
+        "media_id": media_id,
+        "url": get_media_storage().url(blob_key(blob.sha256, blob.content_type)),
+        "size": blob.size,
+        "content_type": blob.content_type,
+    }
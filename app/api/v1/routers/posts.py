@@ -1,13 +1,48 @@
 import logging
+import re
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    status,
+)
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from redis.asyncio import Redis
+from sqlalchemy import func, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import desc, select
+from sqlalchemy.orm import contains_eager
+from sqlmodel import delete, desc, select
 
-from app.database import get_session
+from app.config import get_settings
+from app.database import get_read_session, get_redis, get_session
 from app.dependencies import get_current_user
-from app.models import Post, User
+from app.likes import (
+    get_unflushed_like_deltas,
+    get_unflushed_reply_like_deltas,
+    record_like_delta,
+)
+from app.live import broadcaster, publish_post, stream_feed_events
+from app.models import Media, Post, PostLike, Reply, User, UserStatus
+from app.pagination import (
+    decode_cursor,
+    decode_rank_cursor,
+    encode_cursor,
+    encode_rank_cursor,
+)
+from app.profiles import invalidate_profiles
+from app.response_cache import cached_response, invalidate_tags
+from app.timeline import fan_out_post, read_home_timeline
 
 router = APIRouter(prefix="/posts", tags=["posts"])
 
@@ -17,6 +52,185 @@ class CreatePostRequest(BaseModel):
     media: list[str]
 
 
+def serialize_post(post: Post, like_delta: int = 0):
+    return {
+        "id": post.id,
+        "created_at": post.created_at,
+        "updated_at": post.updated_at,
+        "content": post.content,
+        "media": post.media,
+        "likes": post.likes + like_delta,
+        "edited": post.edited,
+        "reply_count": post.reply_count,
+        "last_reply_at": post.last_reply_at,
+        "user": {
+            "username": post.user.username,
+            "profile_picture": post.user.profile_picture,
+            "name": post.user.name,
+            "bio": post.user.bio,
+        },
+    }
+
+
+@dataclass(slots=True)
+class FeedAuthor:
+    username: Optional[str]
+    profile_picture: Optional[str]
+    name: Optional[str]
+    bio: Optional[str]
+
+
+@dataclass(slots=True)
+class FeedPost:
+    """Feed item built straight from a row, serialized natively by orjson."""
+
+    id: str
+    created_at: datetime
+    updated_at: datetime
+    content: str
+    media: list[str]
+    likes: int
+    edited: bool
+    reply_count: int
+    last_reply_at: Optional[datetime]
+    user: FeedAuthor
+    replies: list["FeedReply"] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class FeedReply:
+    id: str
+    created_at: datetime
+    updated_at: datetime
+    content: str
+    media: list[str]
+    likes: int
+    user: FeedAuthor
+
+
+def build_feed_query(
+    limit: int, cursor: Optional[tuple[datetime, str]] = None, offset: int = 0
+):
+    # Only the columns the feed returns, in one statement: no ORM identity map,
+    # no selectin load of Post.user
+    query = (
+        select(
+            Post.id,
+            Post.created_at,
+            Post.updated_at,
+            Post.content,
+            Post.media,
+            Post.likes,
+            Post.edited,
+            Post.reply_count,
+            Post.last_reply_at,
+            User.username,
+            User.profile_picture,
+            User.name,
+            User.bio,
+        )
+        .join(User, Post.user_id == User.id)
+        # Posts of deleted and deactivated accounts disappear as soon as the
+        # status flips; checked on the author row the join reads anyway
+        .where(User.status == UserStatus.active)
+        .order_by(desc(Post.created_at), desc(Post.id))
+        .limit(limit)
+    )
+    if cursor:
+        # Keyset pagination: resume strictly after the last post served
+        query = query.where(tuple_(Post.created_at, Post.id) < tuple_(*cursor))
+    elif offset:
+        query = query.offset(offset)
+    return query
+
+
+def feed_post_from_row(row: tuple) -> FeedPost:
+    *post, username, profile_picture, name, bio = row
+    return FeedPost(*post, FeedAuthor(username, profile_picture, name, bio))
+
+
+REPLY_COLUMNS = (
+    Reply.id,
+    Reply.created_at,
+    Reply.updated_at,
+    Reply.content,
+    Reply.media,
+    Reply.likes,
+    User.username,
+    User.profile_picture,
+    User.name,
+    User.bio,
+)
+
+
+def feed_reply_from_row(row: tuple) -> FeedReply:
+    *reply, username, profile_picture, name, bio = row
+    return FeedReply(*reply, FeedAuthor(username, profile_picture, name, bio))
+
+
+def build_latest_replies_query(post_ids: list[str], per_post: int):
+    # One statement for the whole page: number each post's replies newest
+    # first and keep the first few, walking ix_replies_post_id_created_at
+    position = (
+        func.row_number()
+        .over(
+            partition_by=Reply.post_id,
+            order_by=(desc(Reply.created_at), desc(Reply.id)),
+        )
+        .label("position")
+    )
+    ranked = (
+        select(Reply.post_id, *REPLY_COLUMNS, position)
+        .join(User, Reply.user_id == User.id)
+        .where(Reply.post_id.in_(post_ids), User.status == UserStatus.active)
+        .subquery()
+    )
+    return (
+        select(*(column for column in ranked.c if column.name != "position"))
+        .where(ranked.c.position <= per_post)
+        .order_by(ranked.c.post_id, ranked.c.created_at, ranked.c.id)
+    )
+
+
+async def attach_latest_replies(
+    db: AsyncSession, redis: Redis, posts: list[FeedPost], count: int
+):
+    if not posts or not count:
+        return
+    by_id = {post.id: post for post in posts}
+    rows = await db.execute(build_latest_replies_query(list(by_id), count))
+    replies = []
+    for post_id, *row in rows:
+        reply = feed_reply_from_row(row)
+        by_id[post_id].replies.append(reply)
+        replies.append(reply)
+
+    like_deltas = await get_unflushed_reply_like_deltas(
+        redis, [reply.id for reply in replies]
+    )
+    for reply in replies:
+        reply.likes += like_deltas.get(reply.id, 0)
+
+
+async def validate_media_ids(
+    db: AsyncSession, user_id: uuid.UUID, media_ids: list[str]
+):
+    # Posts may only reference media their author uploaded through /media
+    if len(media_ids) > get_settings().media_max_per_post:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Too many media"
+        )
+    if not media_ids:
+        return
+    owned = await db.scalars(
+        select(Media.id).where(Media.id.in_(media_ids), Media.user_id == user_id)
+    )
+    if set(owned) != set(media_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown media"
+        )
+
+
 @router.post(
     "/",
     status_code=status.HTTP_201_CREATED,
@@ -28,11 +242,14 @@ class CreatePostRequest(BaseModel):
 )
 async def create_post(
     request: CreatePostRequest,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_session),
+    redis: Redis = Depends(get_redis),
 ):
     try:
         content = request.content.strip()
+        await validate_media_ids(db, current_user.id, request.media)
 
         post = Post(
             user_id=current_user.id,
@@ -41,8 +258,31 @@ async def create_post(
         )
 
         db.add(post)
+        await db.execute(
+            update(User)
+            .where(User.id == current_user.id)
+            .values(post_count=User.post_count + 1)
+        )
         await db.commit()
         await db.refresh(post)
+
+        background_tasks.add_task(
+            fan_out_post, redis, post.id, current_user.id, post.created_at
+        )
+        await publish_post(
+            redis,
+            {
+                "id": post.id,
+                "created_at": post.created_at,
+                "user": {
+                    "username": current_user.username,
+                    "profile_picture": current_user.profile_picture,
+                    "name": current_user.name,
+                },
+            },
+        )
+        await invalidate_tags(redis, "posts")
+        await invalidate_profiles(redis, current_user.username)
         return {"message": "Post created successfully", "post_id": str(post.id)}
     except HTTPException:
         raise
@@ -61,44 +301,262 @@ async def create_post(
         status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
     },
 )
+@cached_response(ttl_seconds=5, tags=["posts"])
 async def get_posts(
-    limit: int = 10,
-    offset: int = 0,
+    limit: int = Query(default=10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    offset: int = Query(default=0, ge=0, deprecated=True),
+    replies: int = Query(default=0, ge=0, le=5),
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_session),
+    db: AsyncSession = Depends(get_read_session),
+    redis: Redis = Depends(get_redis),
 ):
     try:
-        query = (
-            select(Post)
-            .join(User)
-            .where(Post.user_id == User.id)
-            .order_by(desc(Post.created_at))
-            .offset(offset)
-            .limit(limit)
-        )
-        posts = await db.execute(query)
-        posts_with_user = [
-            {
-                "id": post.id,
-                "created_at": post.created_at,
-                "updated_at": post.updated_at,
-                "content": post.content,
-                "media": post.media,
-                "likes": post.likes,
-                "edited": post.edited,
-                "user": {
-                    "username": post.user.username,
-                    "profile_picture": post.user.profile_picture,
-                    "name": post.user.name,
-                    "bio": post.user.bio,
-                },
-            }
-            for post in posts.scalars()
-        ]
+        query = build_feed_query(
+            limit + 1, decode_cursor(cursor) if cursor else None, offset
+        )
+        posts = [feed_post_from_row(row) for row in (await db.execute(query)).all()]
+        next_cursor = None
+        if len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = encode_cursor(posts[-1].created_at, posts[-1].id)
 
-        return posts_with_user
+        like_deltas = await get_unflushed_like_deltas(
+            redis, [post.id for post in posts]
+        )
+        for post in posts:
+            post.likes += like_deltas.get(post.id, 0)
+        await attach_latest_replies(db, redis, posts, replies)
+        return {"posts": posts, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Failed to get posts: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to get posts"
         )
+
+
+def build_prefix_tsquery(text: str) -> Optional[str]:
+    # Every term must match, and each one also matches longer words
+    terms = re.findall(r"\w+", text.lower())
+    if not terms:
+        return None
+    return " & ".join(f"{term}:*" for term in terms[:10])
+
+
+def build_search_query(
+    tsquery: str, limit: int, cursor: Optional[tuple[float, str]] = None
+):
+    search_vector = Post.__table__.c.search_vector
+    ts_query = func.to_tsquery("simple", tsquery)
+    rank = func.ts_rank(search_vector, ts_query)
+    query = (
+        select(Post, rank)
+        .join(Post.user)
+        .options(contains_eager(Post.user))
+        .where(search_vector.op("@@")(ts_query), User.status == UserStatus.active)
+        .order_by(desc(rank), desc(Post.id))
+        .limit(limit)
+    )
+    if cursor:
+        query = query.where(tuple_(rank, Post.id) < tuple_(*cursor))
+    return query
+
+
+@router.get(
+    "/stream",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_503_SERVICE_UNAVAILABLE: {"description": "Too many clients"},
+    },
+)
+async def stream_posts(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    redis: Redis = Depends(get_redis),
+):
+    """Server-sent events announcing new posts, resumable with Last-Event-ID."""
+    subscriber = broadcaster.subscribe()
+    if subscriber is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many live clients",
+            headers={"Retry-After": "5"},
+        )
+
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and not re.fullmatch(r"\d+-\d+", last_event_id):
+        last_event_id = None
+    return StreamingResponse(
+        stream_feed_events(redis, subscriber, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/search",
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+    },
+)
+async def search_posts(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_session),
+    redis: Redis = Depends(get_redis),
+):
+    try:
+        tsquery = build_prefix_tsquery(q)
+        if not tsquery:
+            return {"posts": [], "next_cursor": None}
+
+        query = build_search_query(
+            tsquery, limit + 1, decode_rank_cursor(cursor) if cursor else None
+        )
+        rows = (await db.execute(query)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_post, last_rank = rows[-1]
+            next_cursor = encode_rank_cursor(last_rank, last_post.id)
+
+        like_deltas = await get_unflushed_like_deltas(
+            redis, [post.id for post, _ in rows]
+        )
+        return {
+            "posts": [
+                serialize_post(post, like_deltas.get(post.id, 0)) for post, _ in rows
+            ],
+            "next_cursor": next_cursor,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Failed to search posts: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to search posts"
+        )
+
+
+@router.get(
+    "/home",
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+    },
+)
+async def get_home_timeline(
+    limit: int = Query(default=10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_session),
+    redis: Redis = Depends(get_redis),
+):
+    try:
+        posts = await read_home_timeline(
+            redis,
+            db,
+            current_user.id,
+            limit,
+            decode_cursor(cursor) if cursor else None,
+        )
+        next_cursor = None
+        if len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = encode_cursor(posts[-1].created_at, posts[-1].id)
+
+        like_deltas = await get_unflushed_like_deltas(
+            redis, [post.id for post in posts]
+        )
+        return {
+            "posts": [
+                serialize_post(post, like_deltas.get(post.id, 0)) for post in posts
+            ],
+            "next_cursor": next_cursor,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Failed to get home timeline: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Failed to get home timeline",
+        )
+
+
+@router.post(
+    "/{post_id}/like",
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_404_NOT_FOUND: {"description": "Not Found"},
+    },
+)
+async def like_post(
+    post_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+    redis: Redis = Depends(get_redis),
+):
+    try:
+        result = await db.execute(
+            insert(PostLike)
+            .values(post_id=post_id, user_id=current_user.id)
+            .on_conflict_do_nothing()
+        )
+        await db.commit()
+
+        # Repeated likes are no-ops, so only a new row moves the counter
+        if result.rowcount:
+            await record_like_delta(redis, post_id, 1)
+        return {"message": "Post liked successfully"}
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
+        )
+    except Exception as e:
+        await db.rollback()
+        logging.error(f"Failed to like post: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to like post"
+        )
+
+
+@router.delete(
+    "/{post_id}/like",
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+    },
+)
+async def unlike_post(
+    post_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+    redis: Redis = Depends(get_redis),
+):
+    try:
+        result = await db.execute(
+            delete(PostLike).where(
+                PostLike.post_id == post_id,
+                PostLike.user_id == current_user.id,
+            )
+        )
+        await db.commit()
+
+        if result.rowcount:
+            await record_like_delta(redis, post_id, -1)
+        return {"message": "Post unliked successfully"}
+    except Exception as e:
+        await db.rollback()
+        logging.error(f"Failed to unlike post: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to unlike post"
+        )
@@ -0,0 +1,219 @@
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel
+from redis.asyncio import Redis
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import delete, select
+
+from app.api.v1.routers.posts import (
+    REPLY_COLUMNS,
+    feed_reply_from_row,
+    validate_media_ids,
+)
+from app.database import get_read_session, get_redis, get_session
+from app.dependencies import get_current_user
+from app.likes import get_unflushed_reply_like_deltas, record_reply_like_delta
+from app.models import Post, Reply, ReplyLike, User, UserStatus
+from app.pagination import decode_cursor, encode_cursor
+from app.replies import record_reply
+
+router = APIRouter(prefix="/posts", tags=["replies"])
+
+
+class CreateReplyRequest(BaseModel):
+    content: str
+    media: list[str] = []
+
+
+@router.post(
+    "/{post_id}/replies",
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_404_NOT_FOUND: {"description": "Not Found"},
+    },
+)
+async def create_reply(
+    post_id: str,
+    request: CreateReplyRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+    redis: Redis = Depends(get_redis),
+):
+    try:
+        await validate_media_ids(db, current_user.id, request.media)
+        reply = Reply(
+            user_id=current_user.id,
+            post_id=post_id,
+            content=request.content.strip(),
+            media=request.media,
+        )
+
+        # The foreign key rejects replies to missing posts, no lookup needed
+        db.add(reply)
+        await db.commit()
+
+        # posts.reply_count is updated in batches by the reply flusher
+        await record_reply(redis, post_id, reply.created_at)
+        return {"message": "Reply created successfully", "reply_id": reply.id}
+    except HTTPException:
+        raise
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
+        )
+    except Exception as e:
+        await db.rollback()
+        logging.error(f"Failed to create reply: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to create reply"
+        )
+
+
+@router.get(
+    "/{post_id}/replies",
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_404_NOT_FOUND: {"description": "Not Found"},
+    },
+)
+async def get_replies(
+    post_id: str,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_session),
+    redis: Redis = Depends(get_redis),
+):
+    try:
+        # Oldest first, so a thread reads top to bottom and new replies only
+        # ever append to the last page
+        query = (
+            select(*REPLY_COLUMNS)
+            .join(User, Reply.user_id == User.id)
+            .where(Reply.post_id == post_id, User.status == UserStatus.active)
+            .order_by(Reply.created_at, Reply.id)
+            .limit(limit + 1)
+        )
+        if cursor:
+            query = query.where(
+                tuple_(Reply.created_at, Reply.id) > tuple_(*decode_cursor(cursor))
+            )
+
+        replies = [feed_reply_from_row(row) for row in await db.execute(query)]
+        if not replies and not cursor:
+            if not await db.scalar(select(Post.id).where(Post.id == post_id)):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
+                )
+
+        next_cursor = None
+        if len(replies) > limit:
+            replies = replies[:limit]
+            next_cursor = encode_cursor(replies[-1].created_at, replies[-1].id)
+
+        like_deltas = await get_unflushed_reply_like_deltas(
+            redis, [reply.id for reply in replies]
+        )
+        for reply in replies:
+            reply.likes += like_deltas.get(reply.id, 0)
+        return {"replies": replies, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Failed to get replies: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to get replies"
+        )
+
+
+@router.post(
+    "/{post_id}/replies/{reply_id}/like",
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_404_NOT_FOUND: {"description": "Not Found"},
+    },
+)
+async def like_reply(
+    post_id: str,
+    reply_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+    redis: Redis = Depends(get_redis),
+):
+    try:
+        # Also rejects a reply that belongs to another post
+        if not await db.scalar(
+            select(Reply.id).where(Reply.id == reply_id, Reply.post_id == post_id)
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Reply not found"
+            )
+        result = await db.execute(
+            insert(ReplyLike)
+            .values(reply_id=reply_id, user_id=current_user.id)
+            .on_conflict_do_nothing()
+        )
+        await db.commit()
+
+        # Repeated likes are no-ops, so only a new row moves the counter
+        if result.rowcount:
+            await record_reply_like_delta(redis, reply_id, 1)
+        return {"message": "Reply liked successfully"}
+    except HTTPException:
+        raise
+    except IntegrityError:
+        # Deleted since the lookup
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Reply not found"
+        )
+    except Exception as e:
+        await db.rollback()
+        logging.error(f"Failed to like reply: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to like reply"
+        )
+
+
+@router.delete(
+    "/{post_id}/replies/{reply_id}/like",
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+    },
+)
+async def unlike_reply(
+    post_id: str,
+    reply_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+    redis: Redis = Depends(get_redis),
+):
+    try:
+        result = await db.execute(
+            delete(ReplyLike).where(
+                ReplyLike.reply_id == reply_id,
+                ReplyLike.user_id == current_user.id,
+            )
+        )
+        await db.commit()
+
+        if result.rowcount:
+            await record_reply_like_delta(redis, reply_id, -1)
+        return {"message": "Reply unliked successfully"}
+    except Exception as e:
+        await db.rollback()
+        logging.error(f"Failed to unlike reply: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to unlike reply"
+        )
@@ -1,13 +1,32 @@
 import logging
+import uuid
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel, EmailStr
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from pydantic import BaseModel, EmailStr, Field
+from redis.asyncio import Redis
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import select
+from sqlmodel import delete, select
 
-from app.database import get_session
+from app.accounts import start_account_job
+from app.cache import invalidate_user
+from app.database import get_read_session, get_redis, get_session
 from app.dependencies import get_current_user, get_current_user_email
-from app.models import User, UserGender
+from app.media import blob_key, get_media_storage
+from app.models import Follow, Media, MediaBlob, User, UserGender, UserStatus
+from app.profiles import (
+    can_view_full_profile,
+    invalidate_profiles,
+    load_profile,
+    visible_profile,
+)
+from app.response_cache import conditional_response
+from app.sessions import bind_session, revoke_user_sessions
+from app.timeline import invalidate_home_timeline
+from app.usernames import add_username, is_username_taken
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -29,23 +48,12 @@ class CreateUserRequest(BaseModel):
 )
 async def create_user(
     request: CreateUserRequest,
+    http_request: Request,
     email: str = Depends(get_current_user_email),
     db: AsyncSession = Depends(get_session),
+    redis: Redis = Depends(get_redis),
 ):
     try:
-        # Check if user already exists
-        existing_user = await db.execute(
-            select(User).where(
-                (User.email == email) | (User.username == request.username)
-            )
-        )
-        if existing_user.scalar_one_or_none():
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="User with this email or username already exists",
-            )
-
-        # Create new user
         user = User(
             email=email,
             name=request.name,
@@ -53,11 +61,23 @@ async def create_user(
             gender=request.gender,
         )
 
+        # The unique indexes on email and username reject duplicates, so there
+        # is no need to look them up first
         db.add(user)
         await db.commit()
         await db.refresh(user)
+        await add_username(redis, user.username)
+        # If the session expired meanwhile the account still stands, the
+        # user just logs in again
+        await bind_session(redis, http_request.cookies["session_id"], user)
         return {"message": "User created successfully", "user_id": str(user.id)}
 
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="User with this email or username already exists",
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -81,18 +101,15 @@ class CheckUsernameAvailabilityRequest(BaseModel):
 )
 async def check_username_availability(
     request: CheckUsernameAvailabilityRequest,
-    db: AsyncSession = Depends(get_session),
+    db: AsyncSession = Depends(get_read_session),
+    redis: Redis = Depends(get_redis),
     user_email: EmailStr = Depends(get_current_user_email),
 ):
     try:
-        result = await db.execute(select(User).where(User.username == request.username))
-        user = result.scalar_one_or_none()
-
-        if user:
-            available = False
-        else:
-            available = True
-        return {"available": available, "username": request.username}
+        # Most names typed into the signup form are free and never reach the
+        # database; only possible hits are confirmed on the username index
+        taken = await is_username_taken(redis, db, request.username)
+        return {"available": not taken, "username": request.username}
 
     except HTTPException:
         raise
@@ -106,7 +123,7 @@ async def check_username_availability(
 
 @router.get("/check-user-created")
 async def check_user_created(
-    db: AsyncSession = Depends(get_session),
+    db: AsyncSession = Depends(get_read_session),
     user_email: EmailStr = Depends(get_current_user_email),
 ):
     user_query = await db.execute(select(User).where(User.email == user_email))
@@ -119,8 +136,298 @@ async def check_user_created(
     return {"created": created}
 
 
-@router.get("/@{username}")
+# Same bounds as the users.name column validator
+NAME_MIN_LENGTH = 3
+NAME_MAX_LENGTH = 30
+BIO_MAX_LENGTH = 160
+
+
+class UpdateUserRequest(BaseModel):
+    # Omitted fields are left alone; name and is_private cannot be cleared
+    name: str = Field(
+        default=None, min_length=NAME_MIN_LENGTH, max_length=NAME_MAX_LENGTH
+    )
+    bio: Optional[str] = Field(default=None, max_length=BIO_MAX_LENGTH)
+    # An image the user uploaded through /media, or null to remove the picture
+    profile_picture_id: Optional[str] = None
+    gender: Optional[UserGender] = None
+    is_private: bool = None
+
+
+async def profile_picture_url(
+    db: AsyncSession, user_id: uuid.UUID, media_id: str
+) -> str:
+    blob = (
+        await db.execute(
+            select(MediaBlob.sha256, MediaBlob.content_type)
+            .join(Media, Media.sha256 == MediaBlob.sha256)
+            .where(Media.id == media_id, Media.user_id == user_id)
+        )
+    ).first()
+    if blob is None or not blob.content_type.startswith("image/"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown image"
+        )
+    return get_media_storage().url(blob_key(blob.sha256, blob.content_type))
+
+
+@router.patch(
+    "/",
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+    },
+)
+async def update_user(
+    request: UpdateUserRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+    redis: Redis = Depends(get_redis),
+):
+    try:
+        changes = request.model_dump(exclude_unset=True)
+        if "profile_picture_id" in changes:
+            media_id = changes.pop("profile_picture_id")
+            changes["profile_picture"] = (
+                await profile_picture_url(db, current_user.id, media_id)
+                if media_id is not None
+                else None
+            )
+        if changes:
+            await db.execute(
+                update(User).where(User.id == current_user.id).values(**changes)
+            )
+            await db.commit()
+
+            await invalidate_profiles(redis, current_user.username)
+            await invalidate_user(redis, current_user.id)
+        return {"message": "User updated successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logging.error(f"Failed to update user: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to update user"
+        )
+
+
+async def change_account_status(
+    action: UserStatus,
+    response: Response,
+    current_user: User,
+    db: AsyncSession,
+    redis: Redis,
+):
+    # The status flips now and the account worker does the rest in batches
+    # (python -m app.accounts); posts of non-active authors are already
+    # filtered out of every feed
+    await start_account_job(db, current_user.id, action)
+    await db.commit()
+
+    await revoke_user_sessions(redis, current_user.id)
+    await invalidate_profiles(redis, current_user.username)
+    response.delete_cookie(key="session_id")
+
+
+@router.delete(
+    "/",
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+    },
+)
+async def delete_user(
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+    redis: Redis = Depends(get_redis),
+):
+    try:
+        await change_account_status(
+            UserStatus.deleted, response, current_user, db, redis
+        )
+        return {"message": "Account deletion started"}
+    except Exception as e:
+        await db.rollback()
+        logging.error(f"Failed to delete user: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to delete user"
+        )
+
+
+@router.post(
+    "/deactivate",
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+    },
+)
+async def deactivate_user(
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+    redis: Redis = Depends(get_redis),
+):
+    try:
+        await change_account_status(
+            UserStatus.deactivated, response, current_user, db, redis
+        )
+        return {"message": "Account deactivated"}
+    except Exception as e:
+        await db.rollback()
+        logging.error(f"Failed to deactivate user: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Failed to deactivate user",
+        )
+
+
+@router.get(
+    "/@{username}",
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_404_NOT_FOUND: {"description": "Not Found"},
+    },
+)
 async def get_user_with_username(
-    username: str, current_user: User = Depends(get_current_user)
+    username: str,
+    http_request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_session),
+    redis: Redis = Depends(get_redis),
 ):
-    pass
+    try:
+        profile = await load_profile(redis, db, username)
+        if profile is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+            )
+
+        full = await can_view_full_profile(db, profile, current_user.id)
+        # What is visible depends on the viewer, so shared caches must not
+        # store it; browsers revalidate with the ETag
+        return conditional_response(
+            http_request, visible_profile(profile, full), "private, no-cache"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Failed to get user: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to get user"
+        )
+
+
+async def get_user_id_with_username(db: AsyncSession, username: str):
+    user_id = await db.scalar(select(User.id).where(User.username == username))
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    return user_id
+
+
+async def update_follow_counters(
+    db: AsyncSession, follower_id: uuid.UUID, followee_id: uuid.UUID, delta: int
+):
+    updates = {
+        follower_id: {"following_count": User.following_count + delta},
+        followee_id: {"follower_count": User.follower_count + delta},
+    }
+    # Rows locked in id order so two users following each other at once
+    # cannot deadlock
+    for user_id in sorted(updates):
+        await db.execute(
+            update(User).where(User.id == user_id).values(**updates[user_id])
+        )
+
+
+@router.post(
+    "/@{username}/follow",
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_404_NOT_FOUND: {"description": "Not Found"},
+    },
+)
+async def follow_user(
+    username: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+    redis: Redis = Depends(get_redis),
+):
+    try:
+        followee_id = await get_user_id_with_username(db, username)
+        if followee_id == current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cannot follow yourself",
+            )
+
+        result = await db.execute(
+            insert(Follow)
+            .values(follower_id=current_user.id, followee_id=followee_id)
+            .on_conflict_do_nothing()
+        )
+        # Repeated follows are no-ops, so only a new row moves the counters
+        if result.rowcount:
+            await update_follow_counters(db, current_user.id, followee_id, 1)
+        await db.commit()
+
+        await invalidate_profiles(redis, current_user.username, username)
+
+        # Rebuilt with the new followee's posts on the next read
+        await invalidate_home_timeline(redis, current_user.id)
+        return {"message": "User followed successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logging.error(f"Failed to follow user: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to follow user"
+        )
+
+
+@router.delete(
+    "/@{username}/follow",
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Bad Request"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Unauthorized"},
+        status.HTTP_404_NOT_FOUND: {"description": "Not Found"},
+    },
+)
+async def unfollow_user(
+    username: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+    redis: Redis = Depends(get_redis),
+):
+    try:
+        followee_id = await get_user_id_with_username(db, username)
+        result = await db.execute(
+            delete(Follow).where(
+                Follow.follower_id == current_user.id,
+                Follow.followee_id == followee_id,
+            )
+        )
+        if result.rowcount:
+            await update_follow_counters(db, current_user.id, followee_id, -1)
+        await db.commit()
+
+        await invalidate_profiles(redis, current_user.username, username)
+
+        await invalidate_home_timeline(redis, current_user.id)
+        return {"message": "User unfollowed successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logging.error(f"Failed to unfollow user: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to unfollow user"
+        )
@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+
+from app.jwt import get_jwks
+
+router = APIRouter(prefix="/.well-known", tags=["well-known"])
+
+
+@router.get("/jwks.json")
+async def get_json_web_key_set(response: Response):
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return get_jwks()
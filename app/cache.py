@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Union
+
+from redis.asyncio import Redis
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.config import get_settings
+from app.database import pubsub_messages
+from app.models import User
+
+INVALIDATION_CHANNEL = "user-cache:invalidate"
+
+
+class UserCache:
+    """Per-worker LRU cache of resolved users keyed by session id.
+
+    Entries are plain column snapshots; every hit returns a fresh detached
+    ``User`` so request handlers never share mutable instances.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, str, dict]] = OrderedDict()
+        self._sessions_by_user: dict[str, set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, session_id: str) -> Optional[User]:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, _, data = entry
+        if expires_at <= time.monotonic():
+            self._remove(session_id)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(session_id)
+        self.hits += 1
+        user = User(**data)
+        make_transient_to_detached(user)
+        return user
+
+    def set(self, session_id: str, user: User):
+        if self.max_size <= 0 or self.ttl_seconds <= 0:
+            return
+
+        self._remove(session_id)
+        user_id = str(user.id)
+        self._entries[session_id] = (
+            time.monotonic() + self.ttl_seconds,
+            user_id,
+            user.model_dump(),
+        )
+        self._sessions_by_user.setdefault(user_id, set()).add(session_id)
+
+        while len(self._entries) > self.max_size:
+            oldest_session_id = next(iter(self._entries))
+            self._remove(oldest_session_id)
+            self.evictions += 1
+
+    def invalidate_session(self, session_id: str):
+        if self._remove(session_id):
+            self.invalidations += 1
+
+    def invalidate_user(self, user_id: Union[str, uuid.UUID]):
+        for session_id in list(self._sessions_by_user.get(str(user_id), ())):
+            self.invalidate_session(session_id)
+
+    def clear(self):
+        self._entries.clear()
+        self._sessions_by_user.clear()
+
+    def stats(self) -> dict[str, Union[int, float]]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, session_id: str) -> bool:
+        entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return False
+
+        _, user_id, _ = entry
+        sessions = self._sessions_by_user.get(user_id)
+        if sessions is not None:
+            sessions.discard(session_id)
+            if not sessions:
+                del self._sessions_by_user[user_id]
+        return True
+
+
+user_cache = UserCache(
+    max_size=get_settings().user_cache_max_size,
+    ttl_seconds=get_settings().user_cache_ttl_seconds,
+)
+
+
+async def invalidate_session(redis: Redis, session_id: str):
+    user_cache.invalidate_session(session_id)
+    await redis.publish(INVALIDATION_CHANNEL, f"session:{session_id}")
+
+
+async def invalidate_user(redis: Redis, user_id: Union[str, uuid.UUID]):
+    user_cache.invalidate_user(user_id)
+    await redis.publish(INVALIDATION_CHANNEL, f"user:{user_id}")
+
+
+def _apply_invalidation(message: str):
+    kind, _, key = message.partition(":")
+    if kind == "session":
+        user_cache.invalidate_session(key)
+    elif kind == "user":
+        user_cache.invalidate_user(key)
+
+
+async def listen_for_invalidations(redis: Redis):
+    while True:
+        try:
+            async with redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything published while we were disconnected is lost
+                user_cache.clear()
+                async for message in pubsub_messages(pubsub):
+                    if message["type"] == "message":
+                        _apply_invalidation(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"User cache invalidation listener failed: {str(e)}")
+            user_cache.clear()
+            await asyncio.sleep(1)
@@ -1,31 +1,202 @@
 from functools import lru_cache
+from typing import Any
 
-from pydantic import EmailStr
+from pydantic import BaseModel, EmailStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class JWTVerificationKey(BaseModel):
+    kid: str = ""
+    algorithm: str = "RS256"
+    public_key: str
+
+
+class DatabaseEngineProfile(BaseModel):
+    echo: bool = False
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    # Seconds before a pooled connection is replaced, -1 to keep it forever
+    pool_recycle: int = -1
+    pool_pre_ping: bool = False
+    # Prepared statements cached per asyncpg connection, 0 behind pgbouncer in
+    # transaction mode
+    prepared_statement_cache_size: int = 100
+    slow_query_threshold_ms: float = 500.0
+
+
+# Sized for two uvicorn workers per instance: each worker holds up to
+# pool_size + max_overflow connections
+DATABASE_ENGINE_PROFILES = {
+    "dev": DatabaseEngineProfile(echo=True, pool_size=5, max_overflow=5),
+    "prod": DatabaseEngineProfile(
+        pool_size=10,
+        max_overflow=10,
+        pool_timeout=10.0,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        prepared_statement_cache_size=500,
+        slow_query_threshold_ms=200.0,
+    ),
+    # Like prod, without pre-ping or recycling skewing the measurements and
+    # with a pool large enough for the load test's virtual users
+    "bench": DatabaseEngineProfile(
+        pool_size=20,
+        max_overflow=0,
+        pool_timeout=10.0,
+        prepared_statement_cache_size=500,
+        slow_query_threshold_ms=1000.0,
+    ),
+}
+
+
 class Settings(BaseSettings):
     openapi_url: str = ""
     environment: str = "development"
 
+    # Used by the launcher (python -m app.server); 0 workers means one per CPU
+    host: str = "0.0.0.0"
+    port: int = 8000
+    web_concurrency: int = 0
+
+    # Pool connections each worker opens and primes before reporting ready
+    warmup_pool_connections: int = 5
+    warmup_timeout_seconds: float = 30.0
+    warmup_retry_interval_seconds: float = 5.0
+
     database_url_async: str = ""
+    # dev, prod or bench; defaults to prod in production and dev elsewhere
+    database_profile: str = ""
+    # JSON object overriding fields of the profile, e.g. {"pool_size": 20}
+    database_engine_overrides: dict[str, Any] = {}
+    # JSON list of read replica URLs, built with the same engine profile
+    database_replica_urls: list[str] = []
+    database_replica_max_lag_seconds: float = 10.0
+    database_replica_check_interval_seconds: float = 5.0
+    # After a request commits, that client reads from the primary this long
+    read_your_writes_seconds: float = 5.0
 
     redis_url: str = ""
+    redis_max_connections: int = 50
+    redis_pool_timeout: float = 5.0
+    redis_socket_timeout: float = 5.0
+    redis_socket_connect_timeout: float = 5.0
+    redis_health_check_interval: int = 30
 
+    # RS256, ES256 or EdDSA, matching the type of jwt_private_key
     jwt_algorithm: str = "RS256"
     jwt_public_key: str = ""
     jwt_private_key: str = ""
+    jwt_key_id: str = ""
+    # JSON list of {"kid", "algorithm", "public_key"} accepted besides the
+    # signing key, e.g. the previous key during a rotation
+    jwt_verification_keys: list[JWTVerificationKey] = []
 
     web_app_url: str = "http://localhost:3000"
 
     resend_api_key: str = ""
     sender_email: EmailStr = ""
 
+    email_transport: str = "resend"
+    email_queue_batch_size: int = 100
+    email_max_attempts: int = 5
+    email_retry_base_seconds: float = 2.0
+    email_worker_lease_seconds: int = 60
+    email_http_max_connections: int = 10
+    email_http_timeout_seconds: float = 10.0
+
     cookie_domain: str = "localhost"
 
     verification_email_expiry_minutes: int = 30
     session_expiry_days: int = 7
 
+    # Token buckets written as "<limit>/<period>", e.g. "5/15m"
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "redis"
+    rate_limit_login_ip: str = "20/1m"
+    rate_limit_login_email: str = "5/15m"
+    rate_limit_verify_ip: str = "30/1m"
+
+    # Concurrent requests per route group and worker (see app.admission);
+    # up to limit * queue factor more wait at most max wait before a 503
+    admission_enabled: bool = True
+    admission_limits: dict[str, int] = {
+        "auth": 32,
+        "feed": 16,
+        "media": 4,
+        "default": 16,
+    }
+    admission_queue_factor: float = 2.0
+    admission_max_wait_ms: float = 250.0
+    # Groups whose limit adapts to keep their average latency under a target
+    admission_latency_targets_ms: dict[str, float] = {"feed": 300.0}
+    admission_retry_after_seconds: int = 1
+
+    user_cache_max_size: int = 10_000
+    user_cache_ttl_seconds: float = 30.0
+
+    response_cache_enabled: bool = True
+    profile_cache_ttl_seconds: int = 60
+
+    timeline_max_length: int = 800
+    timeline_ttl_days: int = 14
+    timeline_fanout_max_followers: int = 10_000
+    timeline_fanout_batch_size: int = 1_000
+
+    likes_flush_interval_seconds: float = 5.0
+    likes_flush_batch_size: int = 500
+
+    replies_flush_interval_seconds: float = 5.0
+    replies_flush_batch_size: int = 500
+
+    # "local" writes to media_local_path, served under media_base_url
+    media_storage: str = "local"
+    media_local_path: str = "media"
+    media_base_url: str = "/media/files"
+    media_max_bytes: int = 10 * 1024 * 1024
+    media_allowed_types: list[str] = [
+        "image/jpeg",
+        "image/png",
+        "image/gif",
+        "image/webp",
+        "video/mp4",
+    ]
+    media_max_per_post: int = 4
+
+    # Server-sent feed events (GET /posts/stream), limits are per worker
+    live_stream_max_length: int = 10_000
+    live_max_clients: int = 1_000
+    live_client_queue_size: int = 100
+    live_heartbeat_seconds: float = 15.0
+    live_retry_ms: int = 3_000
+
+    # Account deletion and deactivation jobs (python -m app.accounts)
+    account_jobs_batch_size: int = 500
+    account_jobs_poll_interval_seconds: float = 5.0
+    account_jobs_lease_seconds: float = 60.0
+
+    username_bloom_capacity: int = 1_000_000
+    username_bloom_error_rate: float = 0.01
+
+    metrics_enabled: bool = True
+    metrics_publish_interval_seconds: float = 5.0
+
+    # Bearer token for /admin; the routes answer 404 while it is unset
+    admin_token: str = ""
+
+    def database_engine_profile(self) -> DatabaseEngineProfile:
+        name = self.database_profile or (
+            "prod" if self.environment == "production" else "dev"
+        )
+        if name not in DATABASE_ENGINE_PROFILES:
+            raise ValueError(f"Unknown database profile {name!r}")
+        return DatabaseEngineProfile.model_validate(
+            {
+                **DATABASE_ENGINE_PROFILES[name].model_dump(),
+                **self.database_engine_overrides,
+            }
+        )
+
     model_config = SettingsConfigDict(
         env_file=(".env"),
         env_file_encoding="utf-8",
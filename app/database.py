@@ -1,17 +1,55 @@
-import redis
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import asyncio
+import itertools
+import logging
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import redis.asyncio as aioredis
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session
 from sqlmodel import SQLModel
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.config import get_settings
+from app.metrics import InstrumentedRedis, instrument_engine
 
 # PostgreSQL (asynchronous)
-async_engine = create_async_engine(
-    url=get_settings().database_url_async,
-    echo=True,
-    # Disable the PostgreSQL JIT to improve ENUM datatype handling
-    # https://docs.sqlalchemy.org/en/20/dialects/postgresql.html#disabling-the-postgresql-jit-to-improve-enum-datatype-handling
-    connect_args={"server_settings": {"jit": "off"}},
-)
+engine_profile = get_settings().database_engine_profile()
+
+
+def create_engine(url: str) -> AsyncEngine:
+    engine = create_async_engine(
+        url=url,
+        echo=engine_profile.echo,
+        pool_size=engine_profile.pool_size,
+        max_overflow=engine_profile.max_overflow,
+        pool_timeout=engine_profile.pool_timeout,
+        pool_recycle=engine_profile.pool_recycle,
+        pool_pre_ping=engine_profile.pool_pre_ping,
+        connect_args={
+            # Disable the PostgreSQL JIT to improve ENUM datatype handling
+            # https://docs.sqlalchemy.org/en/20/dialects/postgresql.html#disabling-the-postgresql-jit-to-improve-enum-datatype-handling
+            "server_settings": {"jit": "off"},
+            "prepared_statement_cache_size": (
+                engine_profile.prepared_statement_cache_size
+            ),
+        },
+    )
+    instrument_engine(
+        engine.sync_engine,
+        slow_query_threshold_ms=engine_profile.slow_query_threshold_ms,
+    )
+    return engine
+
+
+async_engine = create_engine(get_settings().database_url_async)
 
 async_session = async_sessionmaker(
     async_engine,
@@ -30,10 +68,183 @@ async def create_tables():
         await connection.run_sync(SQLModel.metadata.create_all)
 
 
-async def get_session():
+async def get_session(request: Request):
     async with async_session() as session:
+        # Lets a commit pin the client to the primary, see PrimaryPinMiddleware
+        session.info["request_state"] = request.state
+        yield session
+
+
+@event.listens_for(Session, "after_commit")
+def remember_primary_write(session: Session):
+    request_state = session.info.get("request_state")
+    if request_state is not None:
+        request_state.wrote_to_primary = True
+
+
+# Redis (asynchronous)
+# The client is created once per worker in the lifespan hook and shared by every
+# request, so all commands are multiplexed over a single bounded connection pool.
+redis_client: Optional[aioredis.Redis] = None
+
+
+def init_redis() -> aioredis.Redis:
+    global redis_client
+    if redis_client is None:
+        settings = get_settings()
+        pool = aioredis.BlockingConnectionPool.from_url(
+            settings.redis_url,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_connect_timeout,
+            health_check_interval=settings.redis_health_check_interval,
+            decode_responses=True,
+        )
+        redis_client = InstrumentedRedis(connection_pool=pool)
+    return redis_client
+
+
+async def close_redis():
+    global redis_client
+    if redis_client is not None:
+        await redis_client.aclose(close_connection_pool=True)
+        redis_client = None
+
+
+async def get_redis() -> aioredis.Redis:
+    # Fall back to lazy initialisation for code paths that run without the
+    # lifespan hook (scripts, one-off commands)
+    return redis_client or init_redis()
+
+
+# Pub/sub connections come from the shared pool, whose socket_timeout also
+# bounds a blocking read, so listen() on a quiet channel fails every few
+# seconds. Short polls return None instead, and the pool's health check PING
+# still catches a connection that is really gone.
+PUBSUB_POLL_SECONDS = 1.0
+
+
+async def pubsub_messages(pubsub: aioredis.client.PubSub) -> AsyncIterator[dict]:
+    while True:
+        message = await pubsub.get_message(
+            ignore_subscribe_messages=True, timeout=PUBSUB_POLL_SECONDS
+        )
+        if message is not None:
+            yield message
+
+
+# Read replicas (asynchronous)
+# Read-only endpoints take their session from get_read_session, which spreads
+# them over the replicas that are keeping up. A client whose request committed
+# on the primary reads from the primary for a short window so they see their
+# own writes.
+@dataclass
+class Replica:
+    engine: AsyncEngine
+    session: async_sessionmaker
+    healthy: bool = True
+
+
+replicas = [
+    Replica(
+        engine=engine,
+        session=async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False),
+    )
+    for engine in map(create_engine, get_settings().database_replica_urls)
+]
+_replica_counter = itertools.count()
+
+PRIMARY_PIN_KEY_PREFIX = "db:primary-pin:"
+
+# Seconds the replica is behind, 0 when it has replayed everything received so
+# an idle primary does not look like lag
+_REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "END"
+)
+
+
+async def is_pinned_to_primary(request: Request) -> bool:
+    session_id = request.cookies.get("session_id")
+    if not session_id:
+        return False
+    try:
+        redis = await get_redis()
+        return bool(await redis.exists(PRIMARY_PIN_KEY_PREFIX + session_id))
+    except Exception as e:
+        logging.error(f"Failed to check primary pin: {str(e)}")
+        return True
+
+
+def choose_replica() -> Optional[Replica]:
+    healthy = [replica for replica in replicas if replica.healthy]
+    if not healthy:
+        return None
+    return healthy[next(_replica_counter) % len(healthy)]
+
+
+async def get_read_session(request: Request):
+    replica = None
+    if replicas and not await is_pinned_to_primary(request):
+        replica = choose_replica()
+    session_factory = replica.session if replica else async_session
+    async with session_factory() as session:
         yield session
 
 
-# Redis
-r = redis.from_url(url=get_settings().redis_url)
+class PrimaryPinMiddleware:
+    """Pins a client to the primary after one of their requests commits."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not replicas:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_pin(message: Message):
+            # Pinned before the response goes out so the client's next read
+            # cannot overtake it
+            if message["type"] == "http.response.start" and scope.get("state", {}).get(
+                "wrote_to_primary"
+            ):
+                session_id = Request(scope).cookies.get("session_id")
+                if session_id:
+                    try:
+                        redis = await get_redis()
+                        await redis.set(
+                            PRIMARY_PIN_KEY_PREFIX + session_id,
+                            1,
+                            px=int(get_settings().read_your_writes_seconds * 1000),
+                        )
+                    except Exception as e:
+                        logging.error(f"Failed to pin session to primary: {str(e)}")
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
+
+
+async def monitor_replica_lag():
+    settings = get_settings()
+    while True:
+        for replica in replicas:
+            try:
+                async with replica.engine.connect() as connection:
+                    lag = await connection.scalar(_REPLICA_LAG_QUERY)
+                healthy = lag <= settings.database_replica_max_lag_seconds
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Failed to check replica lag: {str(e)}")
+                healthy = False
+
+            if healthy != replica.healthy:
+                logging.warning(
+                    f"Replica {replica.engine.url.host} is now "
+                    f"{'in rotation' if healthy else 'out of rotation'}"
+                )
+            replica.healthy = healthy
+        await asyncio.sleep(settings.database_replica_check_interval_seconds)
@@ -1,3 +1,5 @@
+import hmac
+
 from fastapi import (
     Depends,
     HTTPException,
@@ -5,17 +7,21 @@ from fastapi import (
     status,
 )
 from pydantic import EmailStr
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
-from app.database import get_session
-from app.database import r as redis
-from app.models import User
+from app.cache import user_cache
+from app.config import get_settings
+from app.database import get_redis, get_session
+from app.models import User, UserStatus
+from app.sessions import PENDING, bind_session, load_session
 
 
 async def get_current_user(
     request: Request,
     db: AsyncSession = Depends(get_session),
+    redis: Redis = Depends(get_redis),
 ) -> User:
     session_id = request.cookies.get("session_id")
     if not session_id:
@@ -23,24 +29,48 @@ async def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated"
         )
 
-    user_email = redis.get(f"session:{session_id}")
-    if not user_email:
+    cached_user = user_cache.get(session_id)
+    if cached_user:
+        return cached_user
+
+    session = await load_session(redis, session_id)
+    if not session:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired"
         )
 
-    user_query = await db.execute(select(User).where(User.email == user_email))
-    user = user_query.scalars().first()
+    if session.status not in (UserStatus.active.value, PENDING):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Account not active"
+        )
+
+    if session.user_id:
+        user = await db.get(User, session.user_id)
+    else:
+        # Issued before signup (or before sessions recorded the user id): the
+        # account may exist by now, bind it so later lookups use the id
+        user_query = await db.execute(select(User).where(User.email == session.email))
+        user = user_query.scalars().first()
+        if user and not await bind_session(redis, session_id, user):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired"
+            )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
         )
+    if user.status != UserStatus.active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Account not active"
+        )
 
+    user_cache.set(session_id, user)
     return user
 
 
 async def get_current_user_email(
     request: Request,
+    redis: Redis = Depends(get_redis),
 ) -> EmailStr:
     session_id = request.cookies.get("session_id")
     if not session_id:
@@ -48,10 +78,26 @@ async def get_current_user_email(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated"
         )
 
-    user_email = redis.get(f"session:{session_id}")
-    if not user_email:
+    session = await load_session(redis, session_id)
+    if not session:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired"
         )
 
-    return str(user_email)
+    return session.email
+
+
+async def require_admin(request: Request):
+    admin_token = get_settings().admin_token
+    if not admin_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+        token.encode(), admin_token.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
@@ -0,0 +1,84 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from redis.asyncio import Redis
+from redis.asyncio.lock import Lock
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import CounterFlush
+
+# Write-behind counters (app.likes, app.replies) fold a Redis "flushing" hash
+# into Postgres in batches and remove each batch from the hash once it is
+# committed. A worker dying in between, or losing its lock while another one
+# takes over, would apply the batch again; recording the batch in the same
+# transaction as its UPDATE turns the second attempt into a no-op.
+#
+# A generation names one flushing hash and fixes its batch size, so batches
+# always cover the same rows: the hash only ever loses whole batches, and
+# they are taken in sorted order.
+FLUSH_LOCK_SECONDS = 60
+FLUSH_RETENTION = timedelta(days=1)
+DELTA_MARKER_SECONDS = 7 * 24 * 60 * 60
+
+# Adds the deltas at most once per marker, so a caller that records them
+# before committing the rows they count can safely run again after a crash
+_record_deltas_once = """
+if not redis.call('SET', KEYS[1], 1, 'NX', 'EX', ARGV[1]) then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[2], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+
+async def record_deltas_once(
+    redis: Redis, marker_key: str, deltas_key: str, deltas: dict[str, int]
+) -> bool:
+    if not deltas:
+        return False
+    args = [DELTA_MARKER_SECONDS]
+    for row_id, delta in sorted(deltas.items()):
+        args.extend((row_id, delta))
+    return bool(await redis.eval(_record_deltas_once, 2, marker_key, deltas_key, *args))
+
+
+async def flush_generation(
+    redis: Redis, generation_key: str, batch_size: int
+) -> tuple[str, int]:
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hsetnx(generation_key, "id", uuid.uuid4().hex)
+        pipe.hsetnx(generation_key, "batch_size", batch_size)
+        pipe.hmget(generation_key, ["id", "batch_size"])
+        *_, (generation, generation_batch_size) = await pipe.execute()
+    return generation, int(generation_batch_size)
+
+
+async def claim_batch(
+    db: AsyncSession, lock: Lock, generation: str, first_id: str
+) -> bool:
+    """Record a batch in the caller's transaction; False if already applied."""
+    # Also fails the flush if the lock was lost, rather than racing the
+    # worker that holds it now
+    await lock.extend(FLUSH_LOCK_SECONDS, replace_ttl=True)
+    return (
+        await db.scalar(
+            insert(CounterFlush)
+            .values(generation=generation, first_id=first_id)
+            .on_conflict_do_nothing()
+            .returning(CounterFlush.generation)
+        )
+    ) is not None
+
+
+async def prune_flushes(db: AsyncSession):
+    # A generation is finished long before then; later attempts at it could
+    # only come from a worker that lost its lock and fails to extend it
+    await db.execute(
+        delete(CounterFlush).where(
+            CounterFlush.created_at < datetime.now(timezone.utc) - FLUSH_RETENTION
+        )
+    )
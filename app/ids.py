@@ -0,0 +1,66 @@
+import os
+import secrets
+import threading
+import time
+
+# Ids for posts, replies and media: 16 characters of lowercase Crockford
+# base32, the first 9 encoding milliseconds since ID_EPOCH_MS and the last 7
+# random bits from `secrets`. New ids sort after older ones, so inserts land
+# on the right edge of the primary key index instead of splitting random
+# pages, and (created_at, id) orders consistently. Digits and lowercase
+# letters compare the same way under the C and the usual locale collations.
+#
+# The legacy 12 character random ids stay valid: the column is an unbounded
+# VARCHAR and nothing parses ids, so old and new rows simply coexist.
+ALPHABET = "0123456789abcdefghjkmnpqrstvwxyz"
+ID_EPOCH_MS = 1_735_689_600_000  # 2025-01-01T00:00:00Z
+TIME_BITS = 45  # about 1100 years of milliseconds
+RANDOM_BITS = 35
+ID_LENGTH = (TIME_BITS + RANDOM_BITS) // 5
+
+
+class IdGenerator:
+    """Monotonic within a process, collision resistant across processes.
+
+    Several ids in the same millisecond keep their order by adding a random
+    step to the previous random part rather than drawing a new one, which
+    also keeps them unguessable from each other.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new_id(self) -> str:
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000 - ID_EPOCH_MS
+            # A clock stepping back keeps using the last timestamp
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                # Top bit left clear, room for the increments below
+                self._last_random = secrets.randbits(RANDOM_BITS - 1)
+            else:
+                self._last_random += 1 + secrets.randbits(16)
+                if self._last_random >= 1 << RANDOM_BITS:
+                    self._last_ms += 1
+                    self._last_random = secrets.randbits(RANDOM_BITS - 1)
+            value = (self._last_ms << RANDOM_BITS) | self._last_random
+
+        chars = []
+        for _ in range(ID_LENGTH):
+            value, digit = divmod(value, 32)
+            chars.append(ALPHABET[digit])
+        return "".join(reversed(chars))
+
+
+_generator = IdGenerator()
+# A forked child must not continue its parent's sequence
+os.register_at_fork(after_in_child=_generator.reset)
+
+
+def new_id() -> str:
+    return _generator.new_id()
@@ -1,12 +1,83 @@
+import base64
+import hashlib
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from functools import lru_cache
+from typing import Any, Optional
 
 import jwt
+from cryptography.hazmat.primitives import serialization
 from fastapi import HTTPException, status
+from jwt.algorithms import get_default_algorithms
 
 from app.config import get_settings
 
 
+@dataclass(frozen=True)
+class VerificationKey:
+    kid: str
+    algorithm: str
+    public_key: Any
+
+
+@dataclass(frozen=True)
+class KeyRing:
+    signing_kid: str
+    signing_algorithm: str
+    signing_key: Any
+    verification_keys: dict[str, VerificationKey]
+
+
+def _key_id(public_key) -> str:
+    der = public_key.public_bytes(
+        serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    digest = hashlib.sha256(der).digest()
+    return base64.urlsafe_b64encode(digest[:12]).rstrip(b"=").decode()
+
+
+@lru_cache
+def get_keyring() -> KeyRing:
+    """Parse the configured PEM keys once into cryptography key objects."""
+    settings = get_settings()
+
+    signing_key = serialization.load_pem_private_key(
+        settings.jwt_private_key.encode(), password=None
+    )
+    if settings.jwt_public_key:
+        public_key = serialization.load_pem_public_key(settings.jwt_public_key.encode())
+    else:
+        public_key = signing_key.public_key()
+    signing_kid = settings.jwt_key_id or _key_id(public_key)
+
+    verification_keys = {
+        signing_kid: VerificationKey(signing_kid, settings.jwt_algorithm, public_key)
+    }
+    # Retired (or not yet active) keys stay valid for verification, so keys
+    # can be rotated without invalidating outstanding tokens
+    for key in settings.jwt_verification_keys:
+        key_public_key = serialization.load_pem_public_key(key.public_key.encode())
+        kid = key.kid or _key_id(key_public_key)
+        verification_keys[kid] = VerificationKey(kid, key.algorithm, key_public_key)
+
+    return KeyRing(
+        signing_kid=signing_kid,
+        signing_algorithm=settings.jwt_algorithm,
+        signing_key=signing_key,
+        verification_keys=verification_keys,
+    )
+
+
+def get_jwks() -> dict[str, list[dict]]:
+    algorithms = get_default_algorithms()
+    keys = []
+    for key in get_keyring().verification_keys.values():
+        jwk = algorithms[key.algorithm].to_jwk(key.public_key, as_dict=True)
+        jwk.update({"kid": key.kid, "alg": key.algorithm, "use": "sig"})
+        keys.append(jwk)
+    return {"keys": keys}
+
+
 def create_login_token(email: str, expires_delta: Optional[timedelta] = None):
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
@@ -18,10 +89,12 @@ def create_login_token(email: str, expires_delta: Optional[timedelta] = None):
         "sub": email,
         "exp": expire,
     }
+    keyring = get_keyring()
     token = jwt.encode(
         payload,
-        get_settings().jwt_private_key,
-        algorithm=get_settings().jwt_algorithm,
+        keyring.signing_key,
+        algorithm=keyring.signing_algorithm,
+        headers={"kid": keyring.signing_kid},
     )
 
     return token
@@ -29,10 +102,17 @@ def create_login_token(email: str, expires_delta: Optional[timedelta] = None):
 
 def decode_jwt(token: str):
     try:
+        keyring = get_keyring()
+        # Tokens issued before key ids were introduced carry no kid
+        kid = jwt.get_unverified_header(token).get("kid", keyring.signing_kid)
+        key = keyring.verification_keys.get(kid)
+        if not key:
+            raise jwt.InvalidTokenError(f"Unknown key id: {kid}")
+
         payload = jwt.decode(
             token,
-            get_settings().jwt_public_key,
-            algorithms=[get_settings().jwt_algorithm],
+            key.public_key,
+            algorithms=[key.algorithm],
         )
         return payload
     except jwt.ExpiredSignatureError:
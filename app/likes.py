@@ -0,0 +1,203 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+from redis.exceptions import LockError
+from sqlalchemy import Table, bindparam, func, update
+from sqlmodel import select
+
+from app.config import get_settings
+from app.database import async_session, close_redis, init_redis
+from app.flushes import (
+    FLUSH_LOCK_SECONDS,
+    claim_batch,
+    flush_generation,
+    prune_flushes,
+)
+from app.models import Post, PostLike, Reply, ReplyLike
+
+
+# Like counts are written behind: each like/unlike bumps a per-row delta in
+# Redis and a background task periodically folds the deltas into the likes
+# column of posts and replies
+@dataclass(frozen=True)
+class LikeCounter:
+    table: Table
+    pending_key: str
+    flushing_key: str
+    generation_key: str
+    lock_key: str
+
+    @property
+    def apply_deltas(self):
+        # Core statement so a list of parameters runs as a single executemany
+        return (
+            update(self.table)
+            .where(self.table.c.id == bindparam("b_id"))
+            .values(likes=self.table.c.likes + bindparam("b_delta"))
+        )
+
+
+POST_LIKES = LikeCounter(
+    Post.__table__,
+    "likes:posts:pending",
+    "likes:posts:flushing",
+    "likes:posts:flushing-generation",
+    "likes:posts:flush-lock",
+)
+REPLY_LIKES = LikeCounter(
+    Reply.__table__,
+    "likes:replies:pending",
+    "likes:replies:flushing",
+    "likes:replies:flushing-generation",
+    "likes:replies:flush-lock",
+)
+
+
+async def record_like_delta(redis: Redis, post_id: str, delta: int):
+    await redis.hincrby(POST_LIKES.pending_key, post_id, delta)
+
+
+async def record_reply_like_delta(redis: Redis, reply_id: str, delta: int):
+    await redis.hincrby(REPLY_LIKES.pending_key, reply_id, delta)
+
+
+async def _unflushed_deltas(
+    redis: Redis, counter: LikeCounter, row_ids: list[str]
+) -> dict[str, int]:
+    if not row_ids:
+        return {}
+
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hmget(counter.pending_key, row_ids)
+        pipe.hmget(counter.flushing_key, row_ids)
+        pending, flushing = await pipe.execute()
+
+    deltas = {}
+    for row_id, pending_delta, flushing_delta in zip(row_ids, pending, flushing):
+        delta = int(pending_delta or 0) + int(flushing_delta or 0)
+        if delta:
+            deltas[row_id] = delta
+    return deltas
+
+
+async def get_unflushed_like_deltas(
+    redis: Redis, post_ids: list[str]
+) -> dict[str, int]:
+    return await _unflushed_deltas(redis, POST_LIKES, post_ids)
+
+
+async def get_unflushed_reply_like_deltas(
+    redis: Redis, reply_ids: list[str]
+) -> dict[str, int]:
+    return await _unflushed_deltas(redis, REPLY_LIKES, reply_ids)
+
+
+async def _flush(redis: Redis, counter: LikeCounter) -> int:
+    lock = redis.lock(counter.lock_key, timeout=FLUSH_LOCK_SECONDS)
+    if not await lock.acquire(blocking=False):
+        return 0
+
+    try:
+        # A leftover flushing hash means a previous flush died half way; finish
+        # it before taking the next batch of pending deltas
+        if not await redis.exists(counter.flushing_key):
+            if not await redis.exists(counter.pending_key):
+                return 0
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.rename(counter.pending_key, counter.flushing_key)
+                pipe.delete(counter.generation_key)
+                await pipe.execute()
+
+        generation, batch_size = await flush_generation(
+            redis, counter.generation_key, get_settings().likes_flush_batch_size
+        )
+        deltas = await redis.hgetall(counter.flushing_key)
+        # Sorted so concurrent writers always lock rows in the same order
+        items = sorted(
+            (row_id, int(delta)) for row_id, delta in deltas.items() if int(delta)
+        )
+        apply_deltas = counter.apply_deltas
+        for start in range(0, len(items), batch_size):
+            batch = items[start : start + batch_size]
+            async with async_session() as db:
+                if await claim_batch(db, lock, generation, batch[0][0]):
+                    await db.execute(
+                        apply_deltas,
+                        [{"b_id": row_id, "b_delta": delta} for row_id, delta in batch],
+                    )
+                await db.commit()
+            await redis.hdel(counter.flushing_key, *(row_id for row_id, _ in batch))
+
+        await redis.delete(counter.flushing_key, counter.generation_key)
+        async with async_session() as db:
+            await prune_flushes(db)
+            await db.commit()
+        return len(items)
+    finally:
+        try:
+            await lock.release()
+        except LockError:
+            pass
+
+
+async def flush_like_deltas(redis: Redis) -> int:
+    return await _flush(redis, POST_LIKES) + await _flush(redis, REPLY_LIKES)
+
+
+async def run_like_flusher(redis: Redis):
+    while True:
+        await asyncio.sleep(get_settings().likes_flush_interval_seconds)
+        try:
+            await flush_like_deltas(redis)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Failed to flush like counters: {str(e)}")
+
+
+async def _reconcile(redis: Redis, counter: LikeCounter, like_count) -> int:
+    async with redis.lock(counter.lock_key, timeout=600):
+        await redis.delete(
+            counter.pending_key, counter.flushing_key, counter.generation_key
+        )
+        async with async_session() as db:
+            result = await db.execute(
+                update(counter.table)
+                .where(counter.table.c.likes != like_count)
+                .values(likes=like_count)
+            )
+            await db.commit()
+            return result.rowcount
+
+
+async def reconcile_like_counts():
+    """Recompute posts.likes and replies.likes and drop any unflushed deltas."""
+    redis = init_redis()
+    try:
+        post_like_count = (
+            select(func.count())
+            .select_from(PostLike)
+            .where(PostLike.post_id == Post.id)
+            .scalar_subquery()
+        )
+        updated = await _reconcile(redis, POST_LIKES, post_like_count)
+        logging.info(f"Reconciled like counts of {updated} posts")
+
+        reply_like_count = (
+            select(func.count())
+            .select_from(ReplyLike)
+            .where(ReplyLike.reply_id == Reply.id)
+            .scalar_subquery()
+        )
+        updated = await _reconcile(redis, REPLY_LIKES, reply_like_count)
+        logging.info(f"Reconciled like counts of {updated} replies")
+    finally:
+        await close_redis()
+
+
+if __name__ == "__main__":
+    # python -m app.likes
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(reconcile_like_counts())
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Optional
+
+import orjson
+from redis.asyncio import Redis
+
+from app.config import get_settings
+from app.database import pubsub_messages
+from app.metrics import registry
+
+# New posts are appended to a capped Redis stream, whose entry ids double as
+# the SSE event ids clients resume from, and announced on a pub/sub channel.
+# Each worker holds a single subscription to that channel and copies every
+# event into the bounded queue of each of its connected clients.
+FEED_STREAM_KEY = "live:feed"
+FEED_CHANNEL = "live:feed"
+LIVE_CLIENTS_DROPPED = "live_clients_dropped_total"
+
+# Append and announce in one step, so the announcement carries the stream id
+_publish_event = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'data', ARGV[2])
+redis.call('PUBLISH', KEYS[2], id .. ' ' .. ARGV[2])
+return id
+"""
+
+
+def format_event(event_id: str, data: str, event: str = "post") -> bytes:
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n".encode()
+
+
+def stream_id(event_id: str) -> tuple[int, int]:
+    milliseconds, _, sequence = event_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+async def publish_post(redis: Redis, post: dict):
+    try:
+        await redis.eval(
+            _publish_event,
+            2,
+            FEED_STREAM_KEY,
+            FEED_CHANNEL,
+            get_settings().live_stream_max_length,
+            orjson.dumps(post).decode(),
+        )
+    except Exception as e:
+        logging.error(f"Failed to publish post {post.get('id')}: {str(e)}")
+
+
+class Subscriber:
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue[tuple[str, bytes]] = asyncio.Queue(queue_size)
+        self.dropped = asyncio.Event()
+
+
+class FeedBroadcaster:
+    """Fans the worker's single feed subscription out to its SSE clients."""
+
+    def __init__(self):
+        self.subscribers: set[Subscriber] = set()
+
+    def subscribe(self) -> Optional[Subscriber]:
+        settings = get_settings()
+        if len(self.subscribers) >= settings.live_max_clients:
+            return None
+        subscriber = Subscriber(settings.live_client_queue_size)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def drop(self, subscriber: Subscriber):
+        # The client reconnects with Last-Event-ID and catches up from the
+        # stream, instead of the worker buffering without bound for it
+        self.subscribers.discard(subscriber)
+        subscriber.dropped.set()
+        registry.inc(LIVE_CLIENTS_DROPPED)
+
+    def drop_all(self):
+        for subscriber in list(self.subscribers):
+            self.drop(subscriber)
+
+    def broadcast(self, event_id: str, frame: bytes):
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait((event_id, frame))
+            except asyncio.QueueFull:
+                self.drop(subscriber)
+
+    async def run(self, redis: Redis):
+        while True:
+            try:
+                async with redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(FEED_CHANNEL)
+                    async for message in pubsub_messages(pubsub):
+                        if message["type"] != "message":
+                            continue
+                        event_id, _, data = message["data"].partition(" ")
+                        # Encoded once, shared by every client
+                        self.broadcast(event_id, format_event(event_id, data))
+            except asyncio.CancelledError:
+                self.drop_all()
+                raise
+            except Exception as e:
+                logging.error(f"Live feed subscription failed: {str(e)}")
+            # Events published while unsubscribed are only in the stream, so
+            # clients reconnect and resume from it
+            self.drop_all()
+            await asyncio.sleep(1)
+
+
+broadcaster = FeedBroadcaster()
+
+
+async def read_backlog(
+    redis: Redis, last_event_id: str
+) -> tuple[Optional[list[tuple[str, bytes]]], str]:
+    """Events after last_event_id (None if trimmed past it) and the newest id."""
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.xrange(FEED_STREAM_KEY, "-", "+", count=1)
+        pipe.xrevrange(FEED_STREAM_KEY, "+", "-", count=1)
+        pipe.xrange(
+            FEED_STREAM_KEY,
+            f"({last_event_id}",
+            "+",
+            count=get_settings().live_stream_max_length,
+        )
+        oldest, newest, entries = await pipe.execute()
+    newest_id = newest[0][0] if newest else last_event_id
+    if oldest and stream_id(oldest[0][0]) > stream_id(last_event_id):
+        return None, newest_id
+    backlog = [
+        (event_id, format_event(event_id, fields["data"]))
+        for event_id, fields in entries
+    ]
+    return backlog, backlog[-1][0] if backlog else last_event_id
+
+
+async def stream_feed_events(
+    redis: Redis, subscriber: Subscriber, last_event_id: Optional[str]
+) -> AsyncIterator[bytes]:
+    settings = get_settings()
+    try:
+        yield f"retry: {settings.live_retry_ms}\n\n".encode()
+
+        # Subscribed before reading the backlog so nothing falls in between;
+        # events seen in both are skipped by id
+        last_seen = (0, 0)
+        if last_event_id:
+            backlog, newest_id = await read_backlog(redis, last_event_id)
+            if backlog is not None:
+                for _, frame in backlog:
+                    yield frame
+            else:
+                # Trimmed past the client's position: it reloads the feed and
+                # goes on from the newest event
+                yield format_event(newest_id, "{}", event="reset")
+            last_seen = stream_id(newest_id)
+
+        dropped = asyncio.create_task(subscriber.dropped.wait())
+        next_event = None
+        try:
+            while not subscriber.dropped.is_set():
+                next_event = asyncio.create_task(subscriber.queue.get())
+                done, _ = await asyncio.wait(
+                    (next_event, dropped),
+                    timeout=settings.live_heartbeat_seconds,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if next_event not in done:
+                    next_event.cancel()
+                    if dropped in done:
+                        return
+                    # Keeps proxies from closing an idle connection and
+                    # surfaces dead clients
+                    yield b": ping\n\n"
+                    continue
+                event_id, frame = next_event.result()
+                if stream_id(event_id) > last_seen:
+                    yield frame
+        finally:
+            dropped.cancel()
+            if next_event is not None:
+                next_event.cancel()
+    finally:
+        broadcaster.unsubscribe(subscriber)
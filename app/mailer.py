@@ -0,0 +1,293 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from typing import Optional, Protocol
+
+import httpx
+import orjson
+from redis.asyncio import Redis
+
+from app.config import get_settings
+from app.database import close_redis, init_redis
+
+# Messages are JSON documents pushed to the head of EMAIL_QUEUE_KEY and moved
+# from its tail by the worker (python -m app.mailer) into its own processing
+# list, which only empties once the batch is sent or scheduled for a retry.
+# Failed sends wait in EMAIL_RETRY_KEY, scored by the time they become due,
+# and are moved to EMAIL_DEAD_LETTER_KEY once they run out of attempts.
+#
+# Each worker renews a lease while it runs; the processing list of a worker
+# whose lease expired (crashed, redeployed mid-send) goes back to the queue,
+# so a batch may be sent twice but is never lost.
+EMAIL_QUEUE_KEY = "email:queue"
+EMAIL_RETRY_KEY = "email:retry"
+EMAIL_DEAD_LETTER_KEY = "email:dead"
+EMAIL_WORKERS_KEY = "email:workers"
+
+
+def processing_key(worker_id: str) -> str:
+    return f"email:processing:{worker_id}"
+
+
+def worker_lease_key(worker_id: str) -> str:
+    return f"email:worker:{worker_id}"
+
+
+# Moves due retries back to the queue atomically, so two workers never
+# requeue the same message
+_requeue_due_retries = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, message in ipairs(due) do
+    redis.call('ZREM', KEYS[1], message)
+    redis.call('LPUSH', KEYS[2], message)
+end
+return #due
+"""
+
+# Moves up to ARGV[1] more messages after the one BLMOVE waited for
+_move_batch = """
+local moved = 0
+for _ = 1, tonumber(ARGV[1]) do
+    if not redis.call('LMOVE', KEYS[1], KEYS[2], 'RIGHT', 'LEFT') then
+        break
+    end
+    moved = moved + 1
+end
+return moved
+"""
+
+# Requeues the batch of a worker whose lease is gone, unless it came back
+_requeue_stale_batch = """
+if redis.call('EXISTS', KEYS[3]) == 1 then
+    return -1
+end
+local requeued = 0
+-- Newest first onto the tail, so the oldest is the next one popped
+while redis.call('LMOVE', KEYS[1], KEYS[2], 'LEFT', 'RIGHT') do
+    requeued = requeued + 1
+end
+redis.call('SREM', KEYS[4], ARGV[1])
+return requeued
+"""
+
+
+def build_verification_email(to_email: str, token: str) -> dict:
+    settings = get_settings()
+    login_url = f"{settings.web_app_url}/auth/verify?token={token}"
+    html = f"<p>Click the link below to log in:</p><br/><p><a href={login_url}>{login_url}</a></p><br/><p>This link will expire in {settings.verification_email_expiry_minutes} minutes.</p>"
+
+    return {
+        "from": f"Connector <{settings.sender_email}>",
+        "to": [to_email],
+        "subject": "Log in to Connector",
+        "html": html,
+    }
+
+
+async def enqueue_email(redis: Redis, email: dict):
+    # The id identifies the message in logs without its recipient
+    await redis.lpush(
+        EMAIL_QUEUE_KEY,
+        orjson.dumps({"id": uuid.uuid4().hex, "email": email, "attempts": 0}),
+    )
+
+
+class EmailTransport(Protocol):
+    max_batch_size: int
+
+    async def send_batch(self, emails: list[dict]) -> None: ...
+
+    async def aclose(self) -> None: ...
+
+
+class ResendTransport:
+    """Sends through the Resend REST API over one pooled HTTP client."""
+
+    max_batch_size = 100
+
+    def __init__(self, api_key: str):
+        settings = get_settings()
+        self.client = httpx.AsyncClient(
+            base_url="https://api.resend.com",
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=settings.email_http_timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=settings.email_http_max_connections,
+                max_keepalive_connections=settings.email_http_max_connections,
+            ),
+        )
+
+    async def send_batch(self, emails: list[dict]):
+        if len(emails) == 1:
+            response = await self.client.post("/emails", json=emails[0])
+        else:
+            response = await self.client.post("/emails/batch", json=emails)
+        response.raise_for_status()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class StubTransport:
+    """Logs emails instead of sending them, for local development and tests."""
+
+    max_batch_size = 100
+
+    def __init__(self):
+        self.sent: list[dict] = []
+
+    async def send_batch(self, emails: list[dict]):
+        for email in emails:
+            logging.info(f"Stub email to {email['to']}: {email['subject']}")
+        self.sent.extend(emails)
+
+    async def aclose(self):
+        pass
+
+
+def get_transport() -> EmailTransport:
+    settings = get_settings()
+    if settings.email_transport == "stub":
+        return StubTransport()
+    if settings.email_transport == "resend":
+        return ResendTransport(settings.resend_api_key)
+    raise ValueError(f"Unknown email transport: {settings.email_transport}")
+
+
+def retry_delay(attempts: int) -> float:
+    # Exponential backoff with full jitter
+    base = get_settings().email_retry_base_seconds
+    return random.uniform(0, base * 2**attempts)
+
+
+async def _renew_lease(redis: Redis, worker_id: str):
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.sadd(EMAIL_WORKERS_KEY, worker_id)
+        pipe.set(
+            worker_lease_key(worker_id),
+            1,
+            ex=get_settings().email_worker_lease_seconds,
+        )
+        await pipe.execute()
+
+
+async def requeue_stale_batches(redis: Redis) -> int:
+    requeued = 0
+    for worker_id in await redis.smembers(EMAIL_WORKERS_KEY):
+        count = await redis.eval(
+            _requeue_stale_batch,
+            4,
+            processing_key(worker_id),
+            EMAIL_QUEUE_KEY,
+            worker_lease_key(worker_id),
+            EMAIL_WORKERS_KEY,
+            worker_id,
+        )
+        if count > 0:
+            logging.warning(f"Requeued {count} emails of stopped worker {worker_id}")
+            requeued += count
+    return requeued
+
+
+async def _take_batch(
+    redis: Redis, worker_id: str, size: int, timeout: float
+) -> list[bytes]:
+    processing = processing_key(worker_id)
+    # Left over from this worker's previous call if it failed half way
+    if not await redis.exists(processing):
+        first = await redis.blmove(
+            EMAIL_QUEUE_KEY, processing, timeout, "RIGHT", "LEFT"
+        )
+        if not first:
+            return []
+        if size > 1:
+            await redis.eval(_move_batch, 2, EMAIL_QUEUE_KEY, processing, size - 1)
+    # Oldest first, as they left the queue
+    return list(reversed(await redis.lrange(processing, 0, -1)))
+
+
+async def _handle_failure(
+    redis: Redis, worker_id: str, messages: list[dict], error: Exception
+):
+    max_attempts = get_settings().email_max_attempts
+    # Scheduled and released together, so a crash in between cannot lose the
+    # batch or leave it both scheduled and still processing
+    async with redis.pipeline(transaction=True) as pipe:
+        for message in messages:
+            message["attempts"] += 1
+            message["error"] = str(error)
+            if message["attempts"] >= max_attempts:
+                logging.error(
+                    f"Giving up on email {message.get('id')} after "
+                    f"{message['attempts']} attempts: {str(error)}"
+                )
+                pipe.lpush(EMAIL_DEAD_LETTER_KEY, orjson.dumps(message))
+            else:
+                due_at = time.time() + retry_delay(message["attempts"])
+                pipe.zadd(EMAIL_RETRY_KEY, {orjson.dumps(message): due_at})
+        pipe.delete(processing_key(worker_id))
+        await pipe.execute()
+
+
+async def process_batch(
+    redis: Redis, transport: EmailTransport, worker_id: str, timeout: float = 1.0
+) -> int:
+    await _renew_lease(redis, worker_id)
+    await redis.eval(
+        _requeue_due_retries, 2, EMAIL_RETRY_KEY, EMAIL_QUEUE_KEY, time.time(), 1000
+    )
+
+    batch_size = min(get_settings().email_queue_batch_size, transport.max_batch_size)
+    raw_messages = await _take_batch(redis, worker_id, batch_size, timeout)
+    if not raw_messages:
+        return 0
+
+    messages = [orjson.loads(raw) for raw in raw_messages]
+    try:
+        await transport.send_batch([message["email"] for message in messages])
+    except Exception as e:
+        logging.warning(f"Failed to send {len(messages)} emails: {str(e)}")
+        await _handle_failure(redis, worker_id, messages, e)
+    else:
+        await redis.delete(processing_key(worker_id))
+    return len(messages)
+
+
+async def run_worker(transport: Optional[EmailTransport] = None):
+    redis = init_redis()
+    transport = transport or get_transport()
+    worker_id = uuid.uuid4().hex
+    lease_seconds = get_settings().email_worker_lease_seconds
+    next_stale_check = 0.0
+    try:
+        while True:
+            try:
+                # At startup, then about once per lease: a worker that died
+                # shortly before we started is only found once its lease ends
+                if time.monotonic() >= next_stale_check:
+                    await requeue_stale_batches(redis)
+                    next_stale_check = time.monotonic() + lease_seconds
+                await process_batch(redis, transport, worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Email worker failed: {str(e)}")
+                await asyncio.sleep(1)
+    finally:
+        try:
+            # A clean stop gives up its lease right away; the processing list
+            # is empty unless a send was interrupted
+            await redis.delete(worker_lease_key(worker_id))
+            await requeue_stale_batches(redis)
+        except Exception as e:
+            logging.error(f"Failed to release email worker lease: {str(e)}")
+        await transport.aclose()
+        await close_redis()
+
+
+if __name__ == "__main__":
+    # python -m app.mailer
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_worker())
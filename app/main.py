@@ -1,14 +1,33 @@
-import time
+import asyncio
+import logging
 from contextlib import asynccontextmanager
 from datetime import datetime
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import ORJSONResponse
 
-from app.api.v1.internal import admin
-from app.api.v1.routers import auth, posts, users
+from app.admission import AdmissionControlMiddleware
+from app.api.v1.internal import admin, health, metrics
+from app.api.v1.routers import auth, media, posts, replies, users, well_known
+from app.cache import listen_for_invalidations
 from app.config import get_settings
+from app.database import (
+    PrimaryPinMiddleware,
+    close_redis,
+    init_redis,
+    monitor_replica_lag,
+    replicas,
+)
+from app.jwt import get_keyring
+from app.likes import run_like_flusher
+from app.live import broadcaster
+from app.media import MediaFiles
+from app.metrics import MetricsMiddleware, run_metrics_publisher
+from app.replies import run_reply_flusher
+from app.response_cache import cached_response
+from app.usernames import ensure_username_filter
+from app.warmup import readiness, retry_warm_up, warm_up
 
 
 @asynccontextmanager
@@ -18,7 +37,35 @@ async def lifespan(app: FastAPI):
 
     #     await drop_tables()
     #     await create_tables()
+    # Bad keys fail the startup rather than the first login
+    get_keyring()
+    redis = init_redis()
+    background_tasks = []
+    # Requests are only accepted once this returns, so the first ones do not
+    # pay for connecting and compiling; a worker that cannot warm up still
+    # starts, reporting not ready on /healthz/ready until it has
+    try:
+        await asyncio.wait_for(warm_up(redis), get_settings().warmup_timeout_seconds)
+    except Exception as e:
+        logging.error(f"Warmup failed, retrying in the background: {str(e)}")
+        background_tasks.append(asyncio.create_task(retry_warm_up(redis)))
+    background_tasks += [
+        asyncio.create_task(listen_for_invalidations(redis)),
+        asyncio.create_task(broadcaster.run(redis)),
+        asyncio.create_task(run_like_flusher(redis)),
+        asyncio.create_task(run_reply_flusher(redis)),
+        asyncio.create_task(ensure_username_filter(redis)),
+    ]
+    if get_settings().metrics_enabled:
+        background_tasks.append(asyncio.create_task(run_metrics_publisher(redis)))
+    if replicas:
+        background_tasks.append(asyncio.create_task(monitor_replica_lag()))
     yield
+    readiness.ready = False
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await close_redis()
 
 
 app = FastAPI(
@@ -45,14 +92,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(PrimaryPinMiddleware)
+
+if get_settings().admission_enabled:
+    app.add_middleware(AdmissionControlMiddleware)
+
+# Added last so it wraps every other middleware
+if get_settings().metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 
 app.include_router(admin.router)
+app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(posts.router)
+app.include_router(replies.router)
+app.include_router(media.router)
+
+if get_settings().media_storage == "local":
+    app.mount(
+        get_settings().media_base_url,
+        MediaFiles(directory=get_settings().media_local_path, check_dir=False),
+        name="media-files",
+    )
+app.include_router(well_known.router)
 
 
 @app.get("/", response_model=dict[str, str])
+@cached_response(ttl_seconds=60, cache_control="public, max-age=60")
 async def root():
     return {
         "message": "Hello Connectors!",
@@ -60,15 +129,6 @@ async def root():
     }
 
 
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.perf_counter()
-    response = await call_next(request)
-    process_time = time.perf_counter() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
-
-
 # @app.exception_handler(RequestValidationError)
 # async def validation_exception_handler(request: Request, exc: RequestValidationError):
 #     """
@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Optional, Protocol
+
+from fastapi.responses import FileResponse
+from fastapi.staticfiles import StaticFiles
+
+from app.config import get_settings
+
+# Uploads are streamed into a temporary object while being hashed, then
+# committed under their SHA-256 so identical files are stored once. The key
+# ends in an extension for the content type, which is taken from the file's
+# own leading bytes rather than trusted from the client
+EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "video/mp4": "mp4",
+}
+CONTENT_TYPES = {extension: type_ for type_, extension in EXTENSIONS.items()}
+# Enough leading bytes to tell every type above apart
+SNIFF_BYTES = 12
+
+
+class MediaTooLarge(Exception):
+    pass
+
+
+class MediaTypeMismatch(Exception):
+    pass
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp":
+        return "video/mp4"
+    return None
+
+
+class MediaUpload(Protocol):
+    async def write(self, chunk: bytes) -> None: ...
+
+    async def commit(self, key: str) -> None: ...
+
+    async def abort(self) -> None: ...
+
+
+class MediaStorage(Protocol):
+    def open_upload(self) -> MediaUpload: ...
+
+    async def exists(self, key: str) -> bool: ...
+
+    def url(self, key: str) -> str: ...
+
+
+class LocalUpload:
+    def __init__(self, root: Path):
+        self.root = root
+        self.path = root / "tmp" / uuid.uuid4().hex
+        self.file: Optional[BinaryIO] = None
+
+    async def write(self, chunk: bytes):
+        if self.file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.file = open(self.path, "wb")
+        # Disk writes run off the event loop so slow storage never stalls it
+        await asyncio.to_thread(self.file.write, chunk)
+
+    async def commit(self, key: str):
+        if self.file is None:
+            raise ValueError("Empty upload")
+        await asyncio.to_thread(self.file.close)
+        target = self.root / key
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Atomic, and harmless when a concurrent upload of the same file
+        # got there first: the content is identical
+        os.replace(self.path, target)
+
+    async def abort(self):
+        if self.file is not None:
+            await asyncio.to_thread(self.file.close)
+            self.path.unlink(missing_ok=True)
+
+
+class LocalMediaStorage:
+    """Stores blobs on the local filesystem, for development and tests."""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    def open_upload(self) -> LocalUpload:
+        return LocalUpload(self.root)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread((self.root / key).exists)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+class MediaFiles(StaticFiles):
+    """Serves local blobs typed by their key's extension, never sniffed."""
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if isinstance(response, FileResponse):
+            extension = Path(full_path).suffix.lstrip(".")
+            response.headers["content-type"] = CONTENT_TYPES.get(
+                extension, "application/octet-stream"
+            )
+        response.headers["x-content-type-options"] = "nosniff"
+        return response
+
+
+@lru_cache
+def get_media_storage() -> MediaStorage:
+    settings = get_settings()
+    if settings.media_storage == "local":
+        return LocalMediaStorage(settings.media_local_path, settings.media_base_url)
+    raise ValueError(f"Unknown media storage: {settings.media_storage}")
+
+
+def blob_key(sha256: str, content_type: str) -> str:
+    # Fanned out so no directory or prefix holds every blob
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}.{EXTENSIONS[content_type]}"
+
+
+async def store_stream(
+    storage: MediaStorage,
+    chunks: AsyncIterator[bytes],
+    max_bytes: int,
+    content_type: str,
+) -> tuple[str, int]:
+    """Write a stream to storage once per distinct content; return its hash and size.
+
+    Raises MediaTooLarge as soon as the stream passes max_bytes, and
+    MediaTypeMismatch as soon as its leading bytes are not content_type,
+    without reading the rest of it.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    upload = storage.open_upload()
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise MediaTooLarge()
+            if len(head) < SNIFF_BYTES:
+                head += chunk[: SNIFF_BYTES - len(head)]
+                if (
+                    len(head) == SNIFF_BYTES
+                    and sniff_content_type(head) != content_type
+                ):
+                    raise MediaTypeMismatch()
+            digest.update(chunk)
+            await upload.write(chunk)
+
+        if size and sniff_content_type(head) != content_type:
+            raise MediaTypeMismatch()
+        sha256 = digest.hexdigest()
+        key = blob_key(sha256, content_type) if size else ""
+        if size == 0 or await storage.exists(key):
+            await upload.abort()
+        else:
+            await upload.commit(key)
+        return sha256, size
+    except BaseException:
+        await upload.abort()
+        raise
@@ -0,0 +1,345 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Optional, Union
+
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_settings
+
+# Every worker keeps its own in-memory metrics and periodically publishes a
+# snapshot to Redis; /metrics renders the snapshots of all live workers with a
+# worker label, so counters never go backwards when a worker restarts
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+WORKERS_KEY = "metrics:workers"
+WORKER_KEY_PREFIX = "metrics:worker:"
+
+# Upper bounds in seconds, the last bucket is +Inf
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HTTP_REQUEST_DURATION = "http_request_duration_seconds"
+HTTP_REQUESTS = "http_requests_total"
+HTTP_REQUESTS_IN_FLIGHT = "http_requests_in_flight"
+DB_QUERY_DURATION = "db_query_duration_seconds"
+DB_SLOW_QUERIES = "db_slow_queries_total"
+REDIS_COMMAND_DURATION = "redis_command_duration_seconds"
+
+SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "COPY"}
+
+Labels = tuple[tuple[str, str], ...]
+
+# Scope of the request being served, so code deep below the route handler
+# (query events) can tell which route it runs for
+current_request_scope: ContextVar[Optional[Scope]] = ContextVar(
+    "current_request_scope", default=None
+)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, counts: Optional[list[int]] = None, sum: float = 0.0):
+        self.counts = counts or [0] * (len(BUCKETS) + 1)
+        self.sum = sum
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.histograms: dict[str, dict[Labels, Histogram]] = defaultdict(dict)
+        self.counters: dict[str, dict[Labels, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        self.gauges: dict[str, dict[Labels, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = tuple(labels.items())
+        histogram = self.histograms[name].get(key)
+        if histogram is None:
+            histogram = self.histograms[name][key] = Histogram()
+        histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        self.counters[name][tuple(labels.items())] += amount
+
+    def add_gauge(self, name: str, amount: float, **labels: str):
+        self.gauges[name][tuple(labels.items())] += amount
+
+    def snapshot(self) -> dict:
+        return {
+            "histograms": {
+                name: [[list(labels), h.counts, h.sum] for labels, h in series.items()]
+                for name, series in self.histograms.items()
+            },
+            "counters": {
+                name: [[list(labels), value] for labels, value in series.items()]
+                for name, series in self.counters.items()
+            },
+            "gauges": {
+                name: [[list(labels), value] for labels, value in series.items()]
+                for name, series in {**self.gauges, **_collect_app_gauges()}.items()
+            },
+        }
+
+
+registry = MetricsRegistry()
+
+
+def _collect_app_gauges() -> dict[str, dict[Labels, float]]:
+    # Imported here because both modules depend on app.database, which
+    # instruments its clients with this module
+    from app.admission import limiters
+    from app.cache import user_cache
+    from app.live import broadcaster
+    from app.rate_limit import throttled_requests
+
+    gauges: dict[str, dict[Labels, float]] = {
+        f"user_cache_{name}": {(): value} for name, value in user_cache.stats().items()
+    }
+    for group, limiter in limiters.items():
+        for name, value in limiter.stats().items():
+            gauges.setdefault(f"admission_{name}", {})[(("group", group),)] = value
+    gauges["live_clients"] = {(): len(broadcaster.subscribers)}
+    gauges["rate_limit_throttled_requests"] = {
+        (("policy", policy),): count for policy, count in throttled_requests.items()
+    }
+    return gauges
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status and in-flight requests.
+
+    Routes are labelled with their path template (/posts/{post_id}) once the
+    router has matched them; anything unmatched shares a single label.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_metrics(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Process-Time", str(time.perf_counter() - start_time))
+            await send(message)
+
+        registry.add_gauge(HTTP_REQUESTS_IN_FLIGHT, 1, method=method)
+        scope_token = current_request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            current_request_scope.reset(scope_token)
+            registry.add_gauge(HTTP_REQUESTS_IN_FLIGHT, -1, method=method)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            registry.observe(
+                HTTP_REQUEST_DURATION,
+                time.perf_counter() - start_time,
+                method=method,
+                route=route,
+            )
+            registry.inc(
+                HTTP_REQUESTS, method=method, route=route, status=str(status_code)
+            )
+
+
+def current_route() -> str:
+    scope = current_request_scope.get()
+    if scope is None:
+        return "-"
+    return f"{scope['method']} {getattr(scope.get('route'), 'path', scope['path'])}"
+
+
+def parameter_shape(parameters) -> str:
+    """Describe bound parameters by type only, values may be personal data."""
+    if isinstance(parameters, dict):
+        return (
+            "{"
+            + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items())
+            + "}"
+        )
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: one shape stands for the whole batch
+            return f"{len(parameters)} x {parameter_shape(parameters[0])}"
+        return "(" + ", ".join(type(v).__name__ for v in parameters) + ")"
+    return type(parameters).__name__
+
+
+def instrument_engine(engine: Engine, slow_query_threshold_ms: Optional[float] = None):
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper()
+        registry.observe(
+            DB_QUERY_DURATION,
+            elapsed,
+            operation=operation if operation in SQL_OPERATIONS else "OTHER",
+        )
+
+        if slow_query_threshold_ms is not None and (
+            elapsed * 1000 >= slow_query_threshold_ms
+        ):
+            route = current_route()
+            registry.inc(DB_SLOW_QUERIES, route=route)
+            logging.warning(
+                f"Slow query ({elapsed * 1000:.1f} ms) in {route}: "
+                f"{' '.join(statement.split())[:2000]} "
+                f"parameters={parameter_shape(parameters)}"
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def discard_query_timer(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start_time"):
+            connection.info["query_start_time"].pop()
+
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        start_time = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            registry.observe(
+                REDIS_COMMAND_DURATION,
+                time.perf_counter() - start_time,
+                command="MULTI" if self.is_transaction else "PIPELINE",
+            )
+
+
+class InstrumentedRedis(Redis):
+    """Redis client timing every command and pipeline round trip."""
+
+    async def execute_command(self, *args, **options):
+        start_time = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            registry.observe(
+                REDIS_COMMAND_DURATION,
+                time.perf_counter() - start_time,
+                command=str(args[0]).upper(),
+            )
+
+    def pipeline(
+        self, transaction: bool = True, shard_hint: Optional[str] = None
+    ) -> InstrumentedPipeline:
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+async def publish_metrics(redis: Redis):
+    ttl = max(int(get_settings().metrics_publish_interval_seconds * 3), 1)
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.setex(WORKER_KEY_PREFIX + WORKER_ID, ttl, json.dumps(registry.snapshot()))
+        pipe.sadd(WORKERS_KEY, WORKER_ID)
+        await pipe.execute()
+
+
+async def run_metrics_publisher(redis: Redis):
+    while True:
+        try:
+            await publish_metrics(redis)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Failed to publish metrics: {str(e)}")
+        await asyncio.sleep(get_settings().metrics_publish_interval_seconds)
+
+
+async def collect_worker_snapshots(redis: Redis) -> dict[str, dict]:
+    snapshots = {WORKER_ID: registry.snapshot()}
+    try:
+        worker_ids = [w for w in await redis.smembers(WORKERS_KEY) if w != WORKER_ID]
+        if worker_ids:
+            values = await redis.mget(WORKER_KEY_PREFIX + w for w in worker_ids)
+            expired = []
+            for worker_id, value in zip(worker_ids, values):
+                if value is None:
+                    expired.append(worker_id)
+                else:
+                    snapshots[worker_id] = json.loads(value)
+            if expired:
+                await redis.srem(WORKERS_KEY, *expired)
+    except Exception as e:
+        logging.error(f"Failed to read metrics of other workers: {str(e)}")
+    return snapshots
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: list, **extra: str) -> str:
+    pairs = [*labels, *extra.items()]
+    return (
+        "{"
+        + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs)
+        + "}"
+    )
+
+
+def _format_value(value: Union[int, float]) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(snapshots: dict[str, dict]) -> str:
+    families: dict[str, tuple[str, list[str]]] = {}
+
+    for worker_id, snapshot in sorted(snapshots.items()):
+        for name, series in snapshot["histograms"].items():
+            _, lines = families.setdefault(name, ("histogram", []))
+            for labels, counts, total in series:
+                cumulative = 0
+                for bound, count in zip((*BUCKETS, "+Inf"), counts):
+                    cumulative += count
+                    bucket_labels = _format_labels(labels, worker=worker_id, le=bound)
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                series_labels = _format_labels(labels, worker=worker_id)
+                lines.append(f"{name}_sum{series_labels} {_format_value(total)}")
+                lines.append(f"{name}_count{series_labels} {cumulative}")
+
+        for kind in ("counters", "gauges"):
+            for name, series in snapshot[kind].items():
+                metric_type = "counter" if kind == "counters" else "gauge"
+                _, lines = families.setdefault(name, (metric_type, []))
+                for labels, value in series:
+                    series_labels = _format_labels(labels, worker=worker_id)
+                    lines.append(f"{name}{series_labels} {_format_value(value)}")
+
+    output = []
+    for name, (metric_type, lines) in sorted(families.items()):
+        output.append(f"# TYPE {name} {metric_type}")
+        output.extend(lines)
+    return "\n".join(output) + "\n"
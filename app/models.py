@@ -1,30 +1,26 @@
 import enum
-import random
-import string
 import uuid
 from datetime import datetime, timezone
 from typing import Annotated, Optional
 
 from pydantic import AfterValidator, EmailStr
+from sqlalchemy import Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlmodel import (
     ARRAY,
     Column,
     DateTime,
     Enum,
     Field,
+    Index,
     Relationship,
     SQLModel,
     String,
 )
 
+from app.ids import new_id
 from app.validators import email_validator
 
-letters_and_digits = string.ascii_letters + string.digits
-
-
-def random_id():
-    return "".join(random.choices(letters_and_digits, k=12))
-
 
 class UserStatus(str, enum.Enum):
     active = "active"
@@ -62,6 +58,10 @@ class User(SQLModel, table=True):
     profile_picture: Optional[str] = Field(default=None)
     bio: Optional[str] = Field(default=None)
     is_private: bool = Field(default=False)
+    # Profile counters, updated in the same transaction as the rows they count
+    post_count: int = Field(default=0)
+    follower_count: int = Field(default=0)
+    following_count: int = Field(default=0)
 
     posts: list["Post"] = Relationship(back_populates="user", cascade_delete=True)
     replies: list["Reply"] = Relationship(back_populates="user", cascade_delete=True)
@@ -69,8 +69,17 @@ class User(SQLModel, table=True):
 
 class Post(SQLModel, table=True):
     __tablename__: str = "posts"  # type: ignore
+    __table_args__ = (
+        # Serves the feed's keyset pagination on (created_at, id) in both directions
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        Index("ix_posts_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_posts_user_id", "user_id"),
+    )
+    # Maintained by Postgres and only used in search predicates, so it is kept
+    # out of the mapper and never loaded with the post
+    __mapper_args__ = {"exclude_properties": ["search_vector"]}
 
-    id: str = Field(default_factory=random_id, primary_key=True)
+    id: str = Field(default_factory=new_id, primary_key=True)
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc),
         sa_column=Column(DateTime(timezone=True)),
@@ -80,10 +89,23 @@ class Post(SQLModel, table=True):
         sa_column=Column(DateTime(timezone=True)),
     )
 
-    content: str = Field(index=True)
+    content: str
     media: list[str] = Field(sa_column=Column(ARRAY(String)))
     likes: int = Field(default=0)
     edited: bool = Field(default=False)
+    # Maintained write-behind from Redis, see app.replies
+    reply_count: int = Field(default=0)
+    last_reply_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True))
+    )
+    search_vector: Optional[str] = Field(
+        default=None,
+        exclude=True,
+        sa_column=Column(
+            TSVECTOR,
+            Computed("to_tsvector('simple', content)", persisted=True),
+        ),
+    )
 
     user_id: Optional[uuid.UUID] = Field(default=None, foreign_key="users.id")
 
@@ -95,8 +117,13 @@ class Post(SQLModel, table=True):
 
 class Reply(SQLModel, table=True):
     __tablename__: str = "replies"  # type: ignore
+    __table_args__ = (
+        # Serves a thread's keyset pagination and the feed's latest replies
+        Index("ix_replies_post_id_created_at", "post_id", "created_at", "id"),
+        Index("ix_replies_user_id", "user_id"),
+    )
 
-    id: str = Field(default_factory=random_id, primary_key=True)
+    id: str = Field(default_factory=new_id, primary_key=True)
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc),
         sa_column=Column(DateTime(timezone=True)),
@@ -106,7 +133,7 @@ class Reply(SQLModel, table=True):
         sa_column=Column(DateTime(timezone=True)),
     )
 
-    content: str = Field(index=True)
+    content: str
     media: list[str] = Field(sa_column=Column(ARRAY(String)))
     likes: int = Field(default=0)
 
@@ -115,3 +142,121 @@ class Reply(SQLModel, table=True):
 
     user: Optional["User"] = Relationship(back_populates="replies")
     post: Optional["Post"] = Relationship(back_populates="replies")
+
+
+class Follow(SQLModel, table=True):
+    __tablename__: str = "follows"  # type: ignore
+
+    follower_id: uuid.UUID = Field(
+        foreign_key="users.id", primary_key=True, ondelete="CASCADE"
+    )
+    followee_id: uuid.UUID = Field(
+        foreign_key="users.id", primary_key=True, index=True, ondelete="CASCADE"
+    )
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True)),
+    )
+
+
+class PostLike(SQLModel, table=True):
+    __tablename__: str = "post_likes"  # type: ignore
+
+    post_id: str = Field(foreign_key="posts.id", primary_key=True, ondelete="CASCADE")
+    user_id: uuid.UUID = Field(
+        foreign_key="users.id", primary_key=True, ondelete="CASCADE"
+    )
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True)),
+    )
+
+
+class ReplyLike(SQLModel, table=True):
+    __tablename__: str = "reply_likes"  # type: ignore
+
+    reply_id: str = Field(
+        foreign_key="replies.id", primary_key=True, ondelete="CASCADE"
+    )
+    user_id: uuid.UUID = Field(
+        foreign_key="users.id", primary_key=True, ondelete="CASCADE"
+    )
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True)),
+    )
+
+
+class MediaBlob(SQLModel, table=True):
+    __tablename__: str = "media_blobs"  # type: ignore
+
+    # Stored once per distinct content, see app.media
+    sha256: str = Field(primary_key=True, max_length=64)
+    size: int
+    content_type: str
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True)),
+    )
+
+
+class Media(SQLModel, table=True):
+    __tablename__: str = "media"  # type: ignore
+    __table_args__ = (
+        # A user uploading the same file twice gets the same media id back
+        Index("ix_media_user_id_sha256", "user_id", "sha256", unique=True),
+    )
+
+    id: str = Field(default_factory=new_id, primary_key=True)
+    user_id: uuid.UUID = Field(foreign_key="users.id", ondelete="CASCADE")
+    sha256: str = Field(foreign_key="media_blobs.sha256", index=True)
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True)),
+    )
+
+
+class AccountJob(SQLModel, table=True):
+    __tablename__: str = "account_jobs"  # type: ignore
+
+    # No foreign key: deleting the user row is the job's last step
+    user_id: uuid.UUID = Field(primary_key=True)
+    # UserStatus.deleted or UserStatus.deactivated
+    action: UserStatus = Field(
+        sa_column=Column(Enum(UserStatus, name="user_status"), nullable=False)
+    )
+    step: str
+    # How far the current step got, for steps that page instead of deleting
+    cursor: Optional[str] = None
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True)),
+    )
+    updated_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True)),
+    )
+    finished_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True))
+    )
+    # A worker owns the job until then; an expired lease lets another resume it
+    lease_expires_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True))
+    )
+    sessions_revoked: int = Field(default=0)
+    replies_deleted: int = Field(default=0)
+    likes_removed: int = Field(default=0)
+    posts_deleted: int = Field(default=0)
+    follows_removed: int = Field(default=0)
+
+
+class CounterFlush(SQLModel, table=True):
+    __tablename__: str = "counter_flushes"  # type: ignore
+
+    # One row per batch of write-behind counter deltas applied, see app.flushes
+    generation: str = Field(primary_key=True)
+    first_id: str = Field(primary_key=True)
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True)),
+    )
@@ -0,0 +1,43 @@
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException, status
+
+
+def _encode(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).rstrip(b"=").decode()
+
+
+def _decode(cursor: str) -> tuple[str, str]:
+    padding = "=" * (-len(cursor) % 4)
+    raw = base64.urlsafe_b64decode(cursor + padding).decode()
+    key, id = raw.split("|", 1)
+    return key, id
+
+
+def encode_cursor(created_at: datetime, id: str) -> str:
+    return _encode(f"{created_at.isoformat()}|{id}")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        created_at, id = _decode(cursor)
+        return datetime.fromisoformat(created_at), id
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def encode_rank_cursor(rank: float, id: str) -> str:
+    return _encode(f"{rank!r}|{id}")
+
+
+def decode_rank_cursor(cursor: str) -> tuple[float, str]:
+    try:
+        rank, id = _decode(cursor)
+        return float(rank), id
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
@@ -0,0 +1,91 @@
+import logging
+import uuid
+from typing import Optional
+
+import orjson
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.config import get_settings
+from app.models import Follow, User, UserStatus
+
+# Public profiles are cached in Redis by username with their counters, which
+# are maintained on users by the writes that change them (posts, follows)
+PUBLIC_FIELDS = (
+    "username",
+    "name",
+    "bio",
+    "profile_picture",
+    "is_private",
+    "created_at",
+    "post_count",
+    "follower_count",
+    "following_count",
+)
+# What anyone may see of a private profile
+PRIVATE_PROFILE_FIELDS = ("username", "name", "profile_picture", "is_private")
+
+
+def profile_key(username: str) -> str:
+    return f"profile:{username}"
+
+
+async def load_profile(redis: Redis, db: AsyncSession, username: str) -> Optional[dict]:
+    try:
+        cached = await redis.get(profile_key(username))
+        if cached:
+            return orjson.loads(cached)
+    except Exception as e:
+        logging.error(f"Profile cache unavailable: {str(e)}")
+
+    row = (
+        await db.execute(
+            select(User.id, *(getattr(User, field) for field in PUBLIC_FIELDS)).where(
+                User.username == username, User.status == UserStatus.active
+            )
+        )
+    ).first()
+    if row is None:
+        return None
+
+    # Round-tripped through JSON so a fresh profile looks exactly like a
+    # cached one (string id and timestamps)
+    data = orjson.dumps(row._asdict())
+    try:
+        await redis.set(
+            profile_key(username), data, ex=get_settings().profile_cache_ttl_seconds
+        )
+    except Exception as e:
+        logging.error(f"Failed to cache profile: {str(e)}")
+    return orjson.loads(data)
+
+
+async def can_view_full_profile(
+    db: AsyncSession, profile: dict, viewer_id: uuid.UUID
+) -> bool:
+    if not profile["is_private"] or profile["id"] == str(viewer_id):
+        return True
+    return bool(
+        await db.scalar(
+            select(Follow.follower_id).where(
+                Follow.follower_id == viewer_id,
+                Follow.followee_id == profile["id"],
+            )
+        )
+    )
+
+
+def visible_profile(profile: dict, full: bool) -> dict:
+    fields = PUBLIC_FIELDS if full else PRIVATE_PROFILE_FIELDS
+    return {field: profile[field] for field in fields}
+
+
+async def invalidate_profiles(redis: Redis, *usernames: Optional[str]):
+    keys = [profile_key(username) for username in usernames if username]
+    if not keys:
+        return
+    try:
+        await redis.delete(*keys)
+    except Exception as e:
+        logging.error(f"Failed to invalidate profiles: {str(e)}")
@@ -0,0 +1,154 @@
+import logging
+import math
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional, Protocol
+
+from fastapi import Depends, HTTPException, Request, status
+from redis.commands.core import AsyncScript
+
+from app.config import get_settings
+from app.database import get_redis
+
+# Token bucket refilled continuously at limit/period, evaluated atomically on
+# the Redis server clock. Returns 0 when a token was taken, otherwise the
+# number of milliseconds until one becomes available.
+_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local period_ms = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+local rate = capacity / period_ms
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local retry_after_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after_ms = math.ceil((1 - tokens) / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], period_ms)
+return retry_after_ms
+"""
+
+_PERIOD_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+throttled_requests: Counter[str] = Counter()
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    name: str
+    limit: int
+    period_seconds: float
+
+    @classmethod
+    def parse(cls, name: str, value: str) -> "RateLimitPolicy":
+        # "<limit>/<period><unit>", e.g. "5/15m"
+        match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d*)\s*([smhd])\s*", value)
+        if not match:
+            raise ValueError(f"Invalid rate limit for {name}: {value!r}")
+        limit, period, unit = match.groups()
+        return cls(name, int(limit), int(period or 1) * _PERIOD_UNITS[unit])
+
+
+class TokenBuckets(Protocol):
+    async def acquire(self, key: str, policy: RateLimitPolicy) -> float: ...
+
+
+class RedisTokenBuckets:
+    def __init__(self):
+        self.script: Optional[AsyncScript] = None
+
+    async def acquire(self, key: str, policy: RateLimitPolicy) -> float:
+        redis = await get_redis()
+        if self.script is None:
+            self.script = redis.register_script(_TOKEN_BUCKET)
+        retry_after_ms = await self.script(
+            keys=[key],
+            args=[policy.limit, int(policy.period_seconds * 1000)],
+            client=redis,
+        )
+        return int(retry_after_ms) / 1000
+
+
+class MemoryTokenBuckets:
+    """Process-local token buckets, for tests and single-process development."""
+
+    def __init__(self):
+        self.buckets: dict[str, tuple[float, float]] = {}
+
+    async def acquire(self, key: str, policy: RateLimitPolicy) -> float:
+        now = time.monotonic()
+        rate = policy.limit / policy.period_seconds
+        tokens, updated_at = self.buckets.get(key, (policy.limit, now))
+        tokens = min(policy.limit, tokens + (now - updated_at) * rate)
+
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate
+        self.buckets[key] = (tokens, now)
+        return retry_after
+
+
+_token_buckets: Optional[TokenBuckets] = None
+
+
+def get_token_buckets() -> TokenBuckets:
+    global _token_buckets
+    if _token_buckets is None:
+        if get_settings().rate_limit_backend == "memory":
+            _token_buckets = MemoryTokenBuckets()
+        else:
+            _token_buckets = RedisTokenBuckets()
+    return _token_buckets
+
+
+def get_policy(name: str) -> RateLimitPolicy:
+    return RateLimitPolicy.parse(name, getattr(get_settings(), f"rate_limit_{name}"))
+
+
+def get_client_ip(request: Request) -> str:
+    # Behind the proxy, uvicorn resolves the client from X-Forwarded-For for
+    # addresses listed in --forwarded-allow-ips
+    return request.client.host if request.client else "unknown"
+
+
+async def enforce_rate_limit(policy_name: str, identifier: str):
+    if not get_settings().rate_limit_enabled:
+        return
+
+    policy = get_policy(policy_name)
+    try:
+        retry_after = await get_token_buckets().acquire(
+            f"ratelimit:{policy.name}:{identifier}", policy
+        )
+    except Exception as e:
+        # Fail open: an unavailable limiter must not take logins down with it
+        logging.error(f"Rate limiter unavailable: {str(e)}")
+        return
+
+    if retry_after > 0:
+        throttled_requests[policy.name] += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+def rate_limit_by_ip(policy_name: str):
+    async def dependency(request: Request):
+        await enforce_rate_limit(policy_name, get_client_ip(request))
+
+    return Depends(dependency)
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from redis.asyncio import Redis
+from redis.exceptions import LockError
+from sqlalchemy import DateTime, bindparam, func, or_, update
+from sqlmodel import select
+
+from app.config import get_settings
+from app.database import async_session, close_redis, init_redis
+from app.flushes import (
+    FLUSH_LOCK_SECONDS,
+    claim_batch,
+    flush_generation,
+    prune_flushes,
+)
+from app.models import Post, Reply
+
+# Reply counters are written behind like the like counters (see app.likes):
+# each new reply bumps a per-post count and latest reply time in Redis, and a
+# background task folds them into posts.reply_count and posts.last_reply_at
+PENDING_COUNTS_KEY = "replies:posts:pending"
+PENDING_LAST_REPLY_KEY = "replies:posts:pending-last"
+FLUSHING_COUNTS_KEY = "replies:posts:flushing"
+FLUSHING_LAST_REPLY_KEY = "replies:posts:flushing-last"
+FLUSHING_GENERATION_KEY = "replies:posts:flushing-generation"
+FLUSH_LOCK_KEY = "replies:posts:flush-lock"
+
+posts_table = Post.__table__
+
+# Core statement so a list of parameters runs as a single executemany
+_apply_reply_deltas = (
+    update(posts_table)
+    .where(posts_table.c.id == bindparam("b_post_id"))
+    .values(
+        reply_count=posts_table.c.reply_count + bindparam("b_delta"),
+        last_reply_at=func.greatest(
+            posts_table.c.last_reply_at,
+            bindparam("b_last_reply_at", type_=DateTime(timezone=True)),
+        ),
+    )
+)
+
+
+async def record_reply(redis: Redis, post_id: str, created_at: datetime):
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hincrby(PENDING_COUNTS_KEY, post_id, 1)
+        pipe.hset(PENDING_LAST_REPLY_KEY, post_id, created_at.timestamp())
+        await pipe.execute()
+
+
+async def flush_reply_counts(redis: Redis) -> int:
+    lock = redis.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_SECONDS)
+    if not await lock.acquire(blocking=False):
+        return 0
+
+    try:
+        # A leftover flushing hash means a previous flush died half way; finish
+        # it before taking the next batch of pending counts
+        if not await redis.exists(FLUSHING_COUNTS_KEY):
+            if not await redis.exists(PENDING_COUNTS_KEY):
+                return 0
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.rename(PENDING_COUNTS_KEY, FLUSHING_COUNTS_KEY)
+                pipe.rename(PENDING_LAST_REPLY_KEY, FLUSHING_LAST_REPLY_KEY)
+                pipe.delete(FLUSHING_GENERATION_KEY)
+                await pipe.execute()
+
+        generation, batch_size = await flush_generation(
+            redis, FLUSHING_GENERATION_KEY, get_settings().replies_flush_batch_size
+        )
+        deltas = await redis.hgetall(FLUSHING_COUNTS_KEY)
+        last_replies = await redis.hgetall(FLUSHING_LAST_REPLY_KEY)
+        # Sorted so concurrent writers always lock rows in the same order
+        # Deletions only lower the count; a NULL time leaves last_reply_at
+        # alone, GREATEST ignores it
+        items = sorted(
+            (
+                post_id,
+                int(delta),
+                datetime.fromtimestamp(float(last_replies[post_id]), timezone.utc)
+                if post_id in last_replies
+                else None,
+            )
+            for post_id, delta in deltas.items()
+        )
+        for start in range(0, len(items), batch_size):
+            batch = items[start : start + batch_size]
+            async with async_session() as db:
+                if await claim_batch(db, lock, generation, batch[0][0]):
+                    await db.execute(
+                        _apply_reply_deltas,
+                        [
+                            {
+                                "b_post_id": post_id,
+                                "b_delta": delta,
+                                "b_last_reply_at": last_reply_at,
+                            }
+                            for post_id, delta, last_reply_at in batch
+                        ],
+                    )
+                await db.commit()
+            post_ids = [post_id for post_id, _, _ in batch]
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.hdel(FLUSHING_COUNTS_KEY, *post_ids)
+                pipe.hdel(FLUSHING_LAST_REPLY_KEY, *post_ids)
+                await pipe.execute()
+
+        await redis.delete(
+            FLUSHING_COUNTS_KEY, FLUSHING_LAST_REPLY_KEY, FLUSHING_GENERATION_KEY
+        )
+        async with async_session() as db:
+            await prune_flushes(db)
+            await db.commit()
+        return len(items)
+    finally:
+        try:
+            await lock.release()
+        except LockError:
+            pass
+
+
+async def run_reply_flusher(redis: Redis):
+    while True:
+        await asyncio.sleep(get_settings().replies_flush_interval_seconds)
+        try:
+            await flush_reply_counts(redis)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Failed to flush reply counters: {str(e)}")
+
+
+async def reconcile_reply_counts():
+    """Recompute reply counters from the replies table, dropping pending ones."""
+    redis = init_redis()
+    try:
+        async with redis.lock(FLUSH_LOCK_KEY, timeout=600):
+            await redis.delete(
+                PENDING_COUNTS_KEY,
+                PENDING_LAST_REPLY_KEY,
+                FLUSHING_COUNTS_KEY,
+                FLUSHING_LAST_REPLY_KEY,
+                FLUSHING_GENERATION_KEY,
+            )
+            async with async_session() as db:
+                reply_count = (
+                    select(func.count())
+                    .select_from(Reply)
+                    .where(Reply.post_id == Post.id)
+                    .scalar_subquery()
+                )
+                last_reply_at = (
+                    select(func.max(Reply.created_at))
+                    .where(Reply.post_id == Post.id)
+                    .scalar_subquery()
+                )
+                result = await db.execute(
+                    update(Post)
+                    .where(
+                        or_(
+                            Post.reply_count != reply_count,
+                            Post.last_reply_at.is_distinct_from(last_reply_at),
+                        )
+                    )
+                    .values(reply_count=reply_count, last_reply_at=last_reply_at)
+                )
+                await db.commit()
+                logging.info(f"Reconciled reply counts of {result.rowcount} posts")
+    finally:
+        await close_redis()
+
+
+if __name__ == "__main__":
+    # python -m app.replies
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(reconcile_reply_counts())
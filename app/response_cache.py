@@ -0,0 +1,173 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import logging
+from typing import Iterable, Optional
+
+from fastapi import Request, Response, status
+from fastapi.responses import ORJSONResponse
+from redis.asyncio import Redis
+
+from app.config import get_settings
+from app.database import get_redis
+
+# A cold key is filled by a single request holding its lock; concurrent
+# requests poll for the result instead of all rebuilding it
+FILL_LOCK_MILLISECONDS = 5_000
+FILL_WAIT_SECONDS = 2.0
+FILL_POLL_SECONDS = 0.025
+
+
+def _cache_key(request: Request) -> str:
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"respcache:{request.url.path}?{query}"
+
+
+def _tag_key(tag: str) -> str:
+    return f"respcache:tag:{tag}"
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _respond(request: Request, etag: str, body: bytes, cache_control: str):
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def conditional_response(request: Request, content, cache_control: str) -> Response:
+    """Serialize content with a strong ETag, answering 304 when it matches."""
+    body = ORJSONResponse(content=content).body
+    return _respond(request, _etag(body), body, cache_control)
+
+
+async def _store(
+    redis: Redis,
+    key: str,
+    etag: str,
+    body: bytes,
+    ttl_seconds: int,
+    tags: Iterable[str],
+):
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping={"etag": etag, "body": body.decode()})
+            pipe.expire(key, ttl_seconds)
+            for tag in tags:
+                pipe.sadd(_tag_key(tag), key)
+                pipe.expire(_tag_key(tag), ttl_seconds * 10)
+            await pipe.execute()
+    except Exception as e:
+        logging.error(f"Failed to store cached response: {str(e)}")
+
+
+async def _release_fill_lock(redis: Redis, key: str):
+    try:
+        await redis.delete(f"{key}:lock")
+    except Exception as e:
+        logging.error(f"Failed to release response cache lock: {str(e)}")
+
+
+async def _wait_for_fill(redis: Redis, key: str) -> Optional[dict]:
+    deadline = asyncio.get_running_loop().time() + FILL_WAIT_SECONDS
+    while asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(FILL_POLL_SECONDS)
+        cached = await redis.hgetall(key)
+        if cached:
+            return cached
+        if not await redis.exists(f"{key}:lock"):
+            return None
+    return None
+
+
+async def invalidate_tags(redis: Redis, *tags: str):
+    for tag in tags:
+        keys = await redis.smembers(_tag_key(tag))
+        await redis.delete(_tag_key(tag), *keys)
+
+
+def cached_response(
+    ttl_seconds: int, tags: Iterable[str] = (), cache_control: str = "no-cache"
+):
+    """Cache a JSON endpoint's serialized body in Redis, shared by all users.
+
+    Only use it for responses that do not depend on the caller. The body is
+    keyed by path and query string, served with a strong ETag, and answered
+    with 304 when If-None-Match matches.
+    """
+    tags = tuple(tags)
+
+    def decorator(endpoint):
+        signature = inspect.signature(endpoint)
+        request_param = next(
+            (
+                parameter.name
+                for parameter in signature.parameters.values()
+                if parameter.annotation is Request
+            ),
+            None,
+        )
+        injects_request = request_param is None
+        if injects_request:
+            request_param = "_cache_request"
+            signature = signature.replace(
+                parameters=[
+                    *signature.parameters.values(),
+                    inspect.Parameter(
+                        request_param,
+                        inspect.Parameter.KEYWORD_ONLY,
+                        annotation=Request,
+                    ),
+                ]
+            )
+
+        @functools.wraps(endpoint)
+        async def wrapper(**kwargs):
+            request: Request = (
+                kwargs.pop(request_param) if injects_request else kwargs[request_param]
+            )
+            if not get_settings().response_cache_enabled:
+                return await endpoint(**kwargs)
+
+            key = _cache_key(request)
+            redis = await get_redis()
+            cached, filling = None, False
+            try:
+                cached = await redis.hgetall(key)
+                if not cached:
+                    filling = await redis.set(
+                        f"{key}:lock", 1, nx=True, px=FILL_LOCK_MILLISECONDS
+                    )
+                    if not filling:
+                        cached = await _wait_for_fill(redis, key)
+            except Exception as e:
+                logging.error(f"Response cache unavailable: {str(e)}")
+
+            if cached:
+                return _respond(
+                    request, cached["etag"], cached["body"].encode(), cache_control
+                )
+
+            try:
+                result = await endpoint(**kwargs)
+                if isinstance(result, Response):
+                    return result
+
+                body = ORJSONResponse(content=result).body
+                etag = _etag(body)
+                if filling:
+                    await _store(redis, key, etag, body, ttl_seconds, tags)
+                return _respond(request, etag, body, cache_control)
+            finally:
+                if filling:
+                    await _release_fill_lock(redis, key)
+
+        wrapper.__signature__ = signature
+        return wrapper
+
+    return decorator
@@ -0,0 +1,47 @@
+import os
+
+import uvicorn
+
+from app.config import get_settings
+
+
+def cpu_count() -> int:
+    # CPUs this process may run on, further limited by a cgroup v2 quota such
+    # as docker --cpus, which the affinity mask does not reflect
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            count = min(count, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return count
+
+
+def worker_count() -> int:
+    # Workers are single threaded event loops, one per CPU keeps them all busy
+    # without contending; each opens its own connection pools
+    return get_settings().web_concurrency or cpu_count()
+
+
+def main():
+    settings = get_settings()
+    uvicorn.run(
+        "app.main:app",
+        host=settings.host,
+        port=settings.port,
+        workers=worker_count(),
+        loop="uvloop",
+        http="httptools",
+        # Trusted proxies come from FORWARDED_ALLOW_IPS
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    # python -m app.server
+    main()
@@ -0,0 +1,187 @@
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from app.cache import invalidate_user
+from app.config import get_settings
+from app.models import User
+
+# A session is a small hash: the user id (empty until the account is created
+# at signup), the email it was verified for, the account status and when it
+# was issued. Each user's session ids are indexed in a set so all of them can
+# be revoked at once without scanning keys
+PENDING = "pending"
+REQUIRED_FIELDS = ("email", "status", "issued_at")
+
+# Only binds a session that still exists: HSET on an expired key would
+# recreate it without a TTL or email. HSET on a live key keeps its TTL
+_bind_session = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'user_id', ARGV[1], 'status', ARGV[2])
+redis.call('SADD', KEYS[2], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return 1
+"""
+
+# Rewrites a legacy string session as a pending hash in one step, so two
+# requests converting it at once cannot interleave. Returns 0 when there is
+# no session, 1 when it already is a hash, or its email and issue time
+_convert_legacy_session = """
+local kind = redis.call('TYPE', KEYS[1])['ok']
+if kind == 'hash' then
+    return 1
+end
+if kind ~= 'string' then
+    return 0
+end
+local ttl = redis.call('TTL', KEYS[1])
+if ttl <= 0 then
+    return 0
+end
+local email = redis.call('GET', KEYS[1])
+local issued_at = tonumber(ARGV[1]) - math.max(0, tonumber(ARGV[2]) - ttl)
+redis.call('DEL', KEYS[1])
+redis.call(
+    'HSET', KEYS[1], 'user_id', '', 'email', email, 'status', ARGV[3],
+    'issued_at', issued_at
+)
+redis.call('EXPIRE', KEYS[1], ttl)
+return {email, issued_at}
+"""
+
+
+def session_key(session_id: str) -> str:
+    return f"session:{session_id}"
+
+
+def user_sessions_key(user_id: Union[str, uuid.UUID]) -> str:
+    return f"user-sessions:{user_id}"
+
+
+@dataclass
+class SessionRecord:
+    session_id: str
+    user_id: Optional[uuid.UUID]
+    email: str
+    status: str
+    issued_at: float
+
+
+def session_expiry() -> int:
+    return get_settings().session_expiry_days * 24 * 60 * 60
+
+
+async def create_session(
+    redis: Redis, session_id: str, email: str, user: Optional[User] = None
+):
+    expiry = session_expiry()
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hset(
+            session_key(session_id),
+            mapping={
+                "user_id": str(user.id) if user else "",
+                "email": email,
+                "status": user.status.value if user else PENDING,
+                "issued_at": int(time.time()),
+            },
+        )
+        pipe.expire(session_key(session_id), expiry)
+        if user:
+            # Sessions all live as long, so the index outlives every member
+            pipe.sadd(user_sessions_key(user.id), session_id)
+            pipe.expire(user_sessions_key(user.id), expiry)
+        await pipe.execute()
+
+
+async def bind_session(redis: Redis, session_id: str, user: User) -> bool:
+    """Attach a session issued before signup to the account it created.
+
+    Returns False if the session expired in the meantime.
+    """
+    return bool(
+        await redis.eval(
+            _bind_session,
+            2,
+            session_key(session_id),
+            user_sessions_key(user.id),
+            str(user.id),
+            user.status.value,
+            session_id,
+            session_expiry(),
+        )
+    )
+
+
+async def _load_legacy_session(
+    redis: Redis, session_id: str
+) -> Optional[SessionRecord]:
+    # Sessions used to be plain strings holding the email; they become a
+    # pending hash keeping their remaining lifetime, the caller binds the user
+    converted = await redis.eval(
+        _convert_legacy_session,
+        1,
+        session_key(session_id),
+        int(time.time()),
+        session_expiry(),
+        PENDING,
+    )
+    if converted == 1:
+        # Converted by a concurrent request
+        return await load_session(redis, session_id)
+    if not converted:
+        return None
+    email, issued_at = converted
+    return SessionRecord(session_id, None, email, PENDING, float(issued_at))
+
+
+async def load_session(redis: Redis, session_id: str) -> Optional[SessionRecord]:
+    try:
+        fields = await redis.hgetall(session_key(session_id))
+    except ResponseError as e:
+        if "WRONGTYPE" not in str(e):
+            raise
+        return await _load_legacy_session(redis, session_id)
+    if not fields:
+        return None
+    if any(not fields.get(name) for name in REQUIRED_FIELDS):
+        # Left behind by a partial write, with no TTL to ever clear it
+        await redis.delete(session_key(session_id))
+        return None
+    return SessionRecord(
+        session_id=session_id,
+        user_id=uuid.UUID(fields["user_id"]) if fields.get("user_id") else None,
+        email=fields["email"],
+        status=fields["status"],
+        issued_at=float(fields["issued_at"]),
+    )
+
+
+async def delete_session(redis: Redis, session_id: str, user_id: Optional[uuid.UUID]):
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(session_key(session_id))
+        if user_id:
+            pipe.srem(user_sessions_key(user_id), session_id)
+        await pipe.execute()
+
+
+async def revoke_user_sessions(redis: Redis, user_id: Union[str, uuid.UUID]) -> int:
+    """Log a user out everywhere, e.g. when the account is deactivated."""
+    session_ids = await redis.smembers(user_sessions_key(user_id))
+    async with redis.pipeline(transaction=True) as pipe:
+        for session_id in session_ids:
+            pipe.delete(session_key(session_id))
+        pipe.delete(user_sessions_key(user_id))
+        await pipe.execute()
+
+    try:
+        await invalidate_user(redis, user_id)
+    except Exception as e:
+        logging.error(f"Failed to invalidate cached sessions: {str(e)}")
+    return len(session_ids)
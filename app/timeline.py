@@ -0,0 +1,293 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from redis.asyncio import Redis
+from sqlalchemy import or_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+from sqlmodel import desc, select
+
+from app.config import get_settings
+from app.database import async_session, close_redis, init_redis
+from app.models import Follow, Post, User, UserStatus
+
+# Authors whose posts are merged into home timelines at read time instead of
+# being copied into every follower's timeline
+HEAVY_AUTHORS_KEY = "timeline:heavy-authors"
+
+# Extra ids fetched past the requested page to absorb posts sharing the
+# cursor's millisecond score
+PAGE_SLACK = 10
+
+
+def home_timeline_key(reader_id: uuid.UUID) -> str:
+    return f"timeline:home:{reader_id}"
+
+
+def author_timeline_key(author_id: uuid.UUID) -> str:
+    return f"timeline:author:{author_id}"
+
+
+def post_score(created_at: datetime) -> int:
+    return int(created_at.timestamp() * 1000)
+
+
+def _push(pipe, key: str, members: dict[str, int]):
+    settings = get_settings()
+    pipe.zadd(key, members)
+    pipe.zremrangebyrank(key, 0, -settings.timeline_max_length - 1)
+    pipe.expire(key, settings.timeline_ttl_days * 24 * 60 * 60)
+
+
+async def _replace(redis: Redis, key: str, members: dict[str, int]):
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        if members:
+            _push(pipe, key, members)
+        await pipe.execute()
+
+
+async def _push_to_homes(
+    redis: Redis, reader_ids: list[uuid.UUID], members: dict[str, int]
+):
+    keys = [home_timeline_key(reader_id) for reader_id in reader_ids]
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.exists(key)
+        exists = await pipe.execute()
+
+        # Timelines that are not materialised are rebuilt from Postgres on the
+        # next read; writing a single post into them would hide older history
+        for key, present in zip(keys, exists):
+            if present:
+                _push(pipe, key, members)
+        await pipe.execute()
+
+
+def _home_posts_query(reader_id: uuid.UUID, *entities):
+    followees = select(Follow.followee_id).where(Follow.follower_id == reader_id)
+    return (
+        select(*entities)
+        .join(User, Post.user_id == User.id)
+        .where(
+            or_(Post.user_id == reader_id, Post.user_id.in_(followees)),
+            User.status == UserStatus.active,
+        )
+        .order_by(desc(Post.created_at), desc(Post.id))
+    )
+
+
+async def fan_out_post(
+    redis: Redis, post_id: str, author_id: uuid.UUID, created_at: datetime
+):
+    settings = get_settings()
+    members = {post_id: post_score(created_at)}
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            _push(pipe, author_timeline_key(author_id), members)
+            await pipe.execute()
+        await _push_to_homes(redis, [author_id], members)
+
+        async with async_session() as db:
+            # Kept on the user row by follow/unfollow, no need to count rows
+            follower_count = await db.scalar(
+                select(User.follower_count).where(User.id == author_id)
+            )
+            if (follower_count or 0) > settings.timeline_fanout_max_followers:
+                await redis.sadd(HEAVY_AUTHORS_KEY, str(author_id))
+                return
+            await redis.srem(HEAVY_AUTHORS_KEY, str(author_id))
+
+            followers = await db.stream_scalars(
+                select(Follow.follower_id)
+                .where(Follow.followee_id == author_id)
+                .execution_options(yield_per=settings.timeline_fanout_batch_size)
+            )
+            async for reader_ids in followers.partitions():
+                await _push_to_homes(redis, list(reader_ids), members)
+    except Exception as e:
+        logging.error(f"Failed to fan out post {post_id}: {str(e)}")
+
+
+async def invalidate_home_timeline(redis: Redis, reader_id: uuid.UUID):
+    await redis.delete(home_timeline_key(reader_id))
+
+
+async def rebuild_home_timeline(redis: Redis, db: AsyncSession, reader_id: uuid.UUID):
+    rows = await db.execute(
+        _home_posts_query(reader_id, Post.id, Post.created_at).limit(
+            get_settings().timeline_max_length
+        )
+    )
+    await _replace(
+        redis,
+        home_timeline_key(reader_id),
+        {id: post_score(created_at) for id, created_at in rows},
+    )
+
+
+async def rebuild_author_timeline(redis: Redis, db: AsyncSession, author_id: uuid.UUID):
+    rows = await db.execute(
+        select(Post.id, Post.created_at)
+        .where(Post.user_id == author_id)
+        .order_by(desc(Post.created_at), desc(Post.id))
+        .limit(get_settings().timeline_max_length)
+    )
+    await _replace(
+        redis,
+        author_timeline_key(author_id),
+        {id: post_score(created_at) for id, created_at in rows},
+    )
+
+
+async def hydrate_posts(db: AsyncSession, post_ids: list[str]) -> list[Post]:
+    if not post_ids:
+        return []
+
+    posts = await db.scalars(
+        select(Post)
+        .join(Post.user)
+        .options(contains_eager(Post.user))
+        # Timelines in Redis still list posts of deactivated and deleted
+        # accounts, they are dropped here
+        .where(Post.id.in_(post_ids), User.status == UserStatus.active)
+    )
+    return list(posts.unique())
+
+
+async def read_home_timeline(
+    redis: Redis,
+    db: AsyncSession,
+    reader_id: uuid.UUID,
+    limit: int,
+    cursor: Optional[tuple[datetime, str]] = None,
+) -> list[Post]:
+    """Return up to ``limit + 1`` posts, newest first, older than ``cursor``."""
+    settings = get_settings()
+    key = home_timeline_key(reader_id)
+    if not await redis.exists(key):
+        await rebuild_home_timeline(redis, db, reader_id)
+
+    max_score = post_score(cursor[0]) if cursor else "+inf"
+    count = limit + 1 + PAGE_SLACK
+    keys = [key]
+
+    heavy_authors = await redis.smembers(HEAVY_AUTHORS_KEY)
+    if heavy_authors:
+        followed_heavy_authors = await db.scalars(
+            select(Follow.followee_id).where(
+                Follow.follower_id == reader_id,
+                Follow.followee_id.in_([uuid.UUID(a) for a in heavy_authors]),
+            )
+        )
+        for author_id in followed_heavy_authors:
+            author_key = author_timeline_key(author_id)
+            if not await redis.exists(author_key):
+                await rebuild_author_timeline(redis, db, author_id)
+            keys.append(author_key)
+
+    # Timelines still list posts of deactivated and deleted accounts, which
+    # hydration drops, so keep reading windows until the page is full or the
+    # timelines run out. A post is only certain to belong on the page once
+    # every timeline with more entries has been read past its score
+    home_size = await redis.zcard(key)
+    offsets = {timeline_key: 0 for timeline_key in keys}
+    posts_by_id: dict[str, Post] = {}
+    while True:
+        async with redis.pipeline(transaction=False) as pipe:
+            for timeline_key in offsets:
+                pipe.zrange(
+                    timeline_key,
+                    max_score,
+                    "-inf",
+                    desc=True,
+                    byscore=True,
+                    offset=offsets[timeline_key],
+                    num=count,
+                    withscores=True,
+                )
+            windows = await pipe.execute()
+
+        frontier = float("-inf")
+        post_ids = []
+        for timeline_key, window in zip(list(offsets), windows):
+            post_ids.extend(id for id, _ in window if id not in posts_by_id)
+            if len(window) < count:
+                del offsets[timeline_key]
+            else:
+                offsets[timeline_key] += count
+                frontier = max(frontier, window[-1][1])
+
+        for post in await hydrate_posts(db, list(dict.fromkeys(post_ids))):
+            if not cursor or (post.created_at, post.id) < cursor:
+                posts_by_id[post.id] = post
+        settled = [
+            post
+            for post in posts_by_id.values()
+            if post_score(post.created_at) > frontier
+        ]
+        if not offsets or len(settled) > limit:
+            break
+        # Fewer round trips when most entries turn out hidden
+        count *= 2
+
+    posts = sorted(settled, key=lambda post: (post.created_at, post.id), reverse=True)[
+        : limit + 1
+    ]
+
+    # Past the end of a full timeline, page through Postgres instead
+    if len(posts) <= limit and home_size >= settings.timeline_max_length:
+        last = (posts[-1].created_at, posts[-1].id) if posts else cursor
+        query = (
+            _home_posts_query(reader_id, Post)
+            .options(contains_eager(Post.user))
+            .limit(limit + 1 - len(posts))
+        )
+        if last:
+            query = query.where(tuple_(Post.created_at, Post.id) < tuple_(*last))
+        posts.extend((await db.scalars(query)).unique())
+
+    return posts
+
+
+async def rebuild_timelines():
+    settings = get_settings()
+    redis = init_redis()
+    try:
+        async with async_session() as db:
+            heavy_authors = await db.scalars(
+                select(User.id).where(
+                    User.follower_count > settings.timeline_fanout_max_followers
+                )
+            )
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.delete(HEAVY_AUTHORS_KEY)
+                heavy_author_ids = [str(author_id) for author_id in heavy_authors]
+                if heavy_author_ids:
+                    pipe.sadd(HEAVY_AUTHORS_KEY, *heavy_author_ids)
+                await pipe.execute()
+
+            authors = (await db.scalars(select(Post.user_id).distinct())).all()
+            for author_id in authors:
+                await rebuild_author_timeline(redis, db, author_id)
+            logging.info(f"Rebuilt {len(authors)} author timelines")
+
+            readers = (
+                await db.scalars(
+                    select(User.id).where(User.status == UserStatus.active)
+                )
+            ).all()
+            for reader_id in readers:
+                await rebuild_home_timeline(redis, db, reader_id)
+            logging.info(f"Rebuilt {len(readers)} home timelines")
+    finally:
+        await close_redis()
+
+
+if __name__ == "__main__":
+    # python -m app.timeline
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(rebuild_timelines())
@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import logging
+import math
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional
+
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.config import get_settings
+from app.database import async_session, close_redis, init_redis
+from app.metrics import registry
+from app.models import User
+
+# Bloom filter of every taken username, kept in a Redis bitmap. A miss means
+# the username is definitely free; a hit still has to be confirmed in Postgres
+BUILD_LOCK_KEY = "usernames:bloom:build-lock"
+BLOOM_CHECKS = "username_bloom_checks_total"
+
+# Users created while a build scans the table are re-added from this far back
+BUILD_CATCH_UP = timedelta(minutes=1)
+
+
+@lru_cache
+def filter_size() -> tuple[int, int]:
+    """Bits and hash functions for the configured capacity and error rate."""
+    settings = get_settings()
+    capacity = settings.username_bloom_capacity
+    error_rate = settings.username_bloom_error_rate
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+def bloom_key() -> str:
+    # The size is part of the key so a filter built for other settings is
+    # never read with the wrong offsets
+    bits, hashes = filter_size()
+    return f"usernames:bloom:{bits}:{hashes}"
+
+
+def bit_offsets(username: str) -> list[int]:
+    bits, hashes = filter_size()
+    digest = hashlib.blake2b(username.encode(), digest_size=16).digest()
+    first = int.from_bytes(digest[:8], "big")
+    second = int.from_bytes(digest[8:], "big") | 1
+    return [(first + i * second) % bits for i in range(hashes)]
+
+
+async def _filter_lookup(redis: Redis, username: str) -> Optional[bool]:
+    """Whether the username may be taken, None when there is no filter."""
+    key = bloom_key()
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.exists(key)
+            for offset in bit_offsets(username):
+                pipe.getbit(key, offset)
+            exists, *bits = await pipe.execute()
+    except Exception as e:
+        logging.error(f"Username filter unavailable: {str(e)}")
+        return None
+    return all(bits) if exists else None
+
+
+async def is_username_taken(redis: Redis, db: AsyncSession, username: str) -> bool:
+    might_exist = await _filter_lookup(redis, username)
+    if might_exist is False:
+        registry.inc(BLOOM_CHECKS, result="negative")
+        return False
+
+    taken = (
+        await db.scalar(select(User.id).where(User.username == username))
+    ) is not None
+    if might_exist is None:
+        registry.inc(BLOOM_CHECKS, result="unavailable")
+    else:
+        # Hits the database shows to be free are the filter's false positives
+        registry.inc(BLOOM_CHECKS, result="taken" if taken else "false_positive")
+    return taken
+
+
+async def add_username(redis: Redis, username: str):
+    key = bloom_key()
+    try:
+        # Only set bits on a complete filter, SETBIT would otherwise create a
+        # partial one that looks ready
+        if not await redis.exists(key):
+            return
+        async with redis.pipeline(transaction=False) as pipe:
+            for offset in bit_offsets(username):
+                pipe.setbit(key, offset, 1)
+            await pipe.execute()
+    except Exception as e:
+        logging.error(f"Failed to add username to filter: {str(e)}")
+
+
+async def build_username_filter(redis: Redis) -> int:
+    """Rebuild the filter from the users table and swap it in atomically."""
+    key = bloom_key()
+    bits, _ = filter_size()
+    build_started = datetime.now(timezone.utc)
+
+    # Set locally and written with a single SET instead of one SETBIT per bit;
+    # Redis numbers bits from the most significant bit of each byte
+    bitmap = bytearray((bits + 7) // 8)
+    count = 0
+    async with async_session() as db:
+        usernames = await db.stream_scalars(
+            select(User.username)
+            .where(User.username.is_not(None))
+            .execution_options(yield_per=10_000)
+        )
+        async for username in usernames:
+            for offset in bit_offsets(username):
+                bitmap[offset >> 3] |= 0x80 >> (offset & 7)
+            count += 1
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.set(f"{key}:building", bytes(bitmap))
+        pipe.rename(f"{key}:building", key)
+        await pipe.execute()
+
+    # Usernames committed while the table was being read may be missing from
+    # the snapshot, and create_user may have added them to the old filter
+    async with async_session() as db:
+        recent = await db.scalars(
+            select(User.username).where(
+                User.username.is_not(None),
+                User.created_at >= build_started - BUILD_CATCH_UP,
+            )
+        )
+        for username in recent:
+            await add_username(redis, username)
+
+    capacity = get_settings().username_bloom_capacity
+    if count > capacity:
+        logging.warning(
+            f"Username filter holds {count} usernames, over its capacity of "
+            f"{capacity}; raise USERNAME_BLOOM_CAPACITY to keep false positives low"
+        )
+    return count
+
+
+async def ensure_username_filter(redis: Redis):
+    """Build the filter unless another worker has, or is building it."""
+    try:
+        if await redis.exists(bloom_key()):
+            return
+        lock = redis.lock(BUILD_LOCK_KEY, timeout=600)
+        if not await lock.acquire(blocking=False):
+            return
+        try:
+            count = await build_username_filter(redis)
+            logging.info(f"Built username filter with {count} usernames")
+        finally:
+            await lock.release()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logging.error(f"Failed to build username filter: {str(e)}")
+
+
+async def rebuild_username_filter():
+    redis = init_redis()
+    try:
+        async with redis.lock(BUILD_LOCK_KEY, timeout=600):
+            count = await build_username_filter(redis)
+            logging.info(f"Rebuilt username filter with {count} usernames")
+    finally:
+        await close_redis()
+
+
+if __name__ == "__main__":
+    # python -m app.usernames
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(rebuild_username_filter())
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import select
+
+from app.api.v1.routers.posts import build_feed_query
+from app.config import get_settings
+from app.database import async_session, engine_profile, replicas
+from app.models import User
+
+# Everything a worker would otherwise do lazily on its first requests: open
+# pool connections, connect to Redis and have SQLAlchemy compile
+# (and asyncpg prepare, per connection) the statements of the hot paths
+
+
+class Readiness:
+    def __init__(self):
+        self.ready = False
+        self.warmup_seconds: float = 0.0
+
+
+readiness = Readiness()
+
+
+async def _prime_connection(session_factory: async_sessionmaker):
+    async with session_factory() as session:
+        # Same statements the feed and authentication run, so later requests
+        # hit the compiled cache and the connection's prepared statements
+        await session.execute(build_feed_query(11))
+        await session.execute(build_feed_query(11, (datetime.now(timezone.utc), "")))
+        await session.get(User, uuid.UUID(int=0))
+        await session.execute(select(User).where(User.email == ""))
+
+
+async def _prime_pool(session_factory: async_sessionmaker, connections: int):
+    # Sessions held concurrently, each on its own connection, which go back
+    # to the pool instead of being closed
+    await asyncio.gather(
+        *(_prime_connection(session_factory) for _ in range(connections))
+    )
+
+
+async def warm_up(redis: Redis):
+    started = time.perf_counter()
+    await redis.ping()
+
+    connections = min(get_settings().warmup_pool_connections, engine_profile.pool_size)
+    if connections > 0:
+        await asyncio.gather(
+            _prime_pool(async_session, connections),
+            *(_prime_pool(replica.session, connections) for replica in replicas),
+        )
+
+    readiness.warmup_seconds = time.perf_counter() - started
+    readiness.ready = True
+    logging.info(f"Worker warmed up in {readiness.warmup_seconds:.2f}s")
+
+
+async def retry_warm_up(redis: Redis):
+    """Keep trying a failed warmup; the worker reports not ready meanwhile."""
+    while not readiness.ready:
+        await asyncio.sleep(get_settings().warmup_retry_interval_seconds)
+        try:
+            await warm_up(redis)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Warmup failed: {str(e)}")
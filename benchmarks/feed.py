@@ -0,0 +1,127 @@
+"""Per-page cost of the post feed: ORM hydration vs column projection.
+
+Walks the feed page by page against the database configured by
+DATABASE_URL_ASYNC (migrations must be applied), seeding posts with the
+search benchmark's generator if needed. Each page is built the way
+get_posts used to (select(Post) with the selectin-loaded Post.user,
+serialize_post) and the way it does now (build_feed_query rows mapped to
+FeedPost), then serialized with orjson. Reports wall time, CPU time and
+statements per page:
+
+    python -m benchmarks.feed --posts 100000 --pages 200
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import orjson
+from sqlalchemy import desc, event, func, select, tuple_
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.api.v1.routers.posts import (
+    build_feed_query,
+    feed_post_from_row,
+    serialize_post,
+)
+from app.config import get_settings
+from app.models import Post, User
+from benchmarks.search import make_vocabulary, seed
+from benchmarks.stats import percentiles
+
+
+async def orm_page(session, limit, cursor):
+    query = (
+        select(Post)
+        .join(User)
+        .order_by(desc(Post.created_at), desc(Post.id))
+        .limit(limit)
+    )
+    if cursor:
+        query = query.where(tuple_(Post.created_at, Post.id) < tuple_(*cursor))
+    posts = (await session.execute(query)).scalars().all()
+    body = orjson.dumps({"posts": [serialize_post(post) for post in posts]})
+    return body, (posts[-1].created_at, posts[-1].id) if posts else None
+
+
+async def projected_page(session, limit, cursor):
+    rows = (await session.execute(build_feed_query(limit, cursor))).all()
+    posts = [feed_post_from_row(row) for row in rows]
+    body = orjson.dumps({"posts": posts})
+    return body, (posts[-1].created_at, posts[-1].id) if posts else None
+
+
+async def walk(session_factory, statements, build_page, pages, limit):
+    wall, cpu, queries = [], [], []
+    cursor = None
+    for _ in range(pages):
+        async with session_factory() as session:
+            statements[0] = 0
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            _, cursor = await build_page(session, limit, cursor)
+            cpu.append((time.process_time() - cpu_start) * 1000)
+            wall.append((time.perf_counter() - wall_start) * 1000)
+            queries.append(statements[0])
+        if cursor is None:
+            break
+    return {
+        "wall": percentiles(wall),
+        "cpu": percentiles(cpu),
+        "statements_per_page": sum(queries) / len(queries),
+    }
+
+
+async def run(args):
+    engine = create_async_engine(
+        get_settings().database_url_async,
+        connect_args={"server_settings": {"jit": "off"}},
+    )
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    # Mutable cell so the listener can count statements of the current page
+    statements = [0]
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_statement(*args):
+        statements[0] += 1
+
+    if not args.skip_seed:
+        rng = random.Random(args.seed)
+        await seed(engine, args.posts, make_vocabulary(rng), rng)
+
+    async with engine.connect() as connection:
+        corpus_size = await connection.scalar(select(func.count()).select_from(Post))
+
+    results = {"corpus_posts": corpus_size, "page_size": args.limit, "paths": {}}
+    # Warm the connection pool and prepared statement caches for both paths
+    await walk(session_factory, statements, orm_page, 5, args.limit)
+    await walk(session_factory, statements, projected_page, 5, args.limit)
+    for name, build_page in (("orm", orm_page), ("projected", projected_page)):
+        results["paths"][name] = await walk(
+            session_factory, statements, build_page, args.pages, args.limit
+        )
+
+    await engine.dispose()
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=11)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--output")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
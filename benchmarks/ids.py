@@ -0,0 +1,143 @@
+"""Insert throughput and primary key index bloat: random vs time-ordered ids.
+
+Creates scratch tables shaped like posts (varchar id primary key) in the
+database configured by DATABASE_URL_ASYNC and fills each with --rows rows in
+batches, keyed by:
+
+- random: the previous random.choices 12 character ids
+- sortable: app.ids.new_id
+- migrated: --rows random ids, then --rows new ids, as a table that switches
+  generator mid-life does
+
+Reports rows per second and the index size after each fill, plus leaf density
+and fragmentation when the pgstattuple extension is available. The tables are
+dropped afterwards:
+
+    python -m benchmarks.ids --rows 1000000 --batch 1000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import string
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import get_settings
+from app.ids import new_id
+
+LEGACY_ALPHABET = string.ascii_letters + string.digits
+
+
+def legacy_random_id() -> str:
+    return "".join(random.choices(LEGACY_ALPHABET, k=12))
+
+
+async def fill(connection, table: str, make_id, rows: int, batch: int) -> float:
+    insert = text(
+        f"INSERT INTO {table} (id, created_at, content) "
+        "VALUES (:id, :created_at, :content)"
+    )
+    started = time.perf_counter()
+    for start in range(0, rows, batch):
+        now = datetime.now(timezone.utc)
+        await connection.execute(
+            insert,
+            [
+                {"id": make_id(), "created_at": now, "content": "x" * 64}
+                for _ in range(min(batch, rows - start))
+            ],
+        )
+        await connection.commit()
+    return rows / (time.perf_counter() - started)
+
+
+async def index_stats(connection, table: str, has_pgstattuple: bool) -> dict:
+    index = f"{table}_pkey"
+    stats = {
+        "index_bytes": await connection.scalar(
+            text("SELECT pg_relation_size(CAST(:index AS regclass))"), {"index": index}
+        ),
+        "table_bytes": await connection.scalar(
+            text("SELECT pg_relation_size(CAST(:table AS regclass))"), {"table": table}
+        ),
+    }
+    if has_pgstattuple:
+        row = (
+            await connection.execute(
+                text(
+                    "SELECT avg_leaf_density, leaf_fragmentation "
+                    "FROM pgstatindex(CAST(:index AS regclass))"
+                ),
+                {"index": index},
+            )
+        ).one()
+        stats["avg_leaf_density"] = row.avg_leaf_density
+        stats["leaf_fragmentation"] = row.leaf_fragmentation
+    return stats
+
+
+async def run(args):
+    engine = create_async_engine(get_settings().database_url_async)
+    random.seed(args.seed)
+    cases = {
+        "random": [legacy_random_id],
+        "sortable": [new_id],
+        "migrated": [legacy_random_id, new_id],
+    }
+    results = {"rows": args.rows, "batch": args.batch, "cases": {}}
+
+    async with engine.connect() as connection:
+        has_pgstattuple = bool(
+            await connection.scalar(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pgstattuple'")
+            )
+        )
+        for name, generators in cases.items():
+            table = f"bench_ids_{name}"
+            await connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+            await connection.execute(
+                text(
+                    f"CREATE TABLE {table} (id varchar PRIMARY KEY, "
+                    "created_at timestamptz, content text)"
+                )
+            )
+            await connection.commit()
+            try:
+                # Only the last phase is timed; earlier ones build the history
+                for make_id in generators:
+                    rows_per_second = await fill(
+                        connection, table, make_id, args.rows, args.batch
+                    )
+                results["cases"][name] = {
+                    "rows_per_second": round(rows_per_second),
+                    **await index_stats(connection, table, has_pgstattuple),
+                }
+            finally:
+                await connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+                await connection.commit()
+
+    await engine.dispose()
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""Latency and throughput of the API under a realistic request mix.
+
+Virtual users log in through /auth/login and /auth/verify, create their
+profile, then loop over feed reads, profile reads and post creation until
+the run ends. Each route reports p50/p95/p99 latency, throughput and error
+rate; results are written as JSON and can be checked against a baseline:
+
+    # in process, against the configured Postgres and a fake Redis
+    python -m benchmarks.load --in-process --fake-redis --users 50 --duration 30
+
+    # against a running server sharing the same Redis
+    python -m benchmarks.load --url http://localhost:8000 --output run.json
+
+    python -m benchmarks.load --in-process --baseline baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from http.cookies import SimpleCookie
+
+import httpx
+
+from benchmarks.stats import compare, percentiles
+
+# (action, weight) of what a logged-in virtual user does next
+REQUEST_MIX = [
+    ("feed", 55),
+    ("home", 15),
+    ("me", 10),
+    ("create_post", 10),
+    ("check_logged_in", 5),
+    ("login", 5),
+]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def request(
+        self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs
+    ) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.latencies[route].append((time.perf_counter() - start) * 1000)
+            self.errors[route] += 1
+            return None
+
+        self.latencies[route].append((time.perf_counter() - start) * 1000)
+        self.statuses[route][response.status_code] += 1
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+    def summary(self, duration: float) -> dict[str, dict]:
+        results = {}
+        for route, samples in sorted(self.latencies.items()):
+            results[route] = {
+                **percentiles(samples),
+                "throughput_rps": round(len(samples) / duration, 2),
+                "error_rate": round(self.errors[route] / len(samples), 4),
+                "statuses": dict(self.statuses[route]),
+            }
+        return results
+
+
+class VirtualUser:
+    def __init__(self, index: int, client, redis, recorder: Recorder, rng):
+        self.index = index
+        self.client = client
+        self.redis = redis
+        self.recorder = recorder
+        self.rng = rng
+        self.email = f"bench-{index}@example.com"
+        self.cookies: dict[str, str] = {}
+        self.cursor = None
+
+    async def login(self):
+        self.cookies = {}
+        await self.recorder.request(
+            self.client,
+            "POST /auth/login",
+            "POST",
+            "/auth/login",
+            json={"email": self.email},
+        )
+        # The emailed link is not delivered during a benchmark; read the
+        # token the same way /auth/verify does
+        token = await self.redis.get(f"login:{self.email}")
+        if not token:
+            return
+
+        response = await self.recorder.request(
+            self.client,
+            "GET /auth/verify",
+            "GET",
+            "/auth/verify",
+            params={"token": token},
+        )
+        if response is None:
+            return
+        cookie = SimpleCookie(response.headers.get("set-cookie", ""))
+        if "session_id" in cookie:
+            self.cookies = {"session_id": cookie["session_id"].value}
+
+    async def setup(self):
+        await self.login()
+        await self.recorder.request(
+            self.client,
+            "POST /users/",
+            "POST",
+            "/users/",
+            cookies=self.cookies,
+            json={
+                "name": f"Bench User {self.index}",
+                "username": f"bench_{self.index}",
+                "gender": "prefer_not_to_say",
+            },
+        )
+
+    async def act(self, action: str):
+        if action == "login":
+            await self.login()
+        elif action == "feed":
+            params = {"limit": 10}
+            # Mostly first pages, sometimes scrolling further
+            if self.cursor and self.rng.random() < 0.3:
+                params["cursor"] = self.cursor
+            response = await self.recorder.request(
+                self.client,
+                "GET /posts/",
+                "GET",
+                "/posts/",
+                params=params,
+                cookies=self.cookies,
+            )
+            if response is not None and response.status_code == 200:
+                self.cursor = response.json().get("next_cursor")
+        elif action == "home":
+            await self.recorder.request(
+                self.client,
+                "GET /posts/home",
+                "GET",
+                "/posts/home",
+                cookies=self.cookies,
+            )
+        elif action == "me":
+            await self.recorder.request(
+                self.client, "GET /auth/me", "GET", "/auth/me", cookies=self.cookies
+            )
+        elif action == "check_logged_in":
+            await self.recorder.request(
+                self.client,
+                "GET /auth/check-user-logged-in",
+                "GET",
+                "/auth/check-user-logged-in",
+                cookies=self.cookies,
+            )
+        elif action == "create_post":
+            await self.recorder.request(
+                self.client,
+                "POST /posts/",
+                "POST",
+                "/posts/",
+                cookies=self.cookies,
+                json={"content": f"benchmark post {uuid.uuid4().hex}", "media": []},
+            )
+
+    async def run(self, deadline: float):
+        actions, weights = zip(*REQUEST_MIX)
+        while time.perf_counter() < deadline:
+            await self.act(self.rng.choices(actions, weights)[0])
+
+
+async def run(args) -> dict:
+    if args.in_process:
+        # Login is rate limited per address and every virtual user shares one
+        os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+        os.environ.setdefault("DATABASE_PROFILE", "bench")
+
+    async with AsyncExitStack() as stack:
+        if args.in_process:
+            from app import database
+            from app.main import app
+
+            if args.fake_redis:
+                import fakeredis
+
+                database.redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            redis = await database.get_redis()
+            transport = httpx.ASGITransport(app=app)
+            base_url = "http://benchmark"
+        else:
+            from redis.asyncio import from_url
+
+            from app.config import get_settings
+
+            redis = from_url(get_settings().redis_url, decode_responses=True)
+            stack.push_async_callback(redis.aclose)
+            transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_connections=args.users)
+            )
+            base_url = args.url
+
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(transport=transport, base_url=base_url, timeout=30)
+        )
+
+        recorder = Recorder()
+        rng = random.Random(args.seed)
+        users = [
+            VirtualUser(index, client, redis, recorder, random.Random(rng.random()))
+            for index in range(args.users)
+        ]
+
+        await asyncio.gather(*(user.setup() for user in users))
+        if args.warmup:
+            warmup_deadline = time.perf_counter() + args.warmup
+            await asyncio.gather(*(user.run(warmup_deadline) for user in users))
+            recorder.latencies.clear()
+            recorder.errors.clear()
+            recorder.statuses.clear()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user.run(start + args.duration) for user in users))
+        duration = time.perf_counter() - start
+
+    routes = recorder.summary(duration)
+    total = sum(result["count"] for result in routes.values())
+    return {
+        "config": {
+            "mode": "in-process" if args.in_process else args.url,
+            "users": args.users,
+            "duration_seconds": args.duration,
+            "seed": args.seed,
+        },
+        "total": {
+            "requests": total,
+            "throughput_rps": round(total / duration, 2),
+            "error_rate": round(sum(recorder.errors.values()) / total, 4)
+            if total
+            else 0,
+        },
+        "routes": routes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="base URL of a running server")
+    target.add_argument("--in-process", action="store_true")
+    parser.add_argument(
+        "--fake-redis",
+        action="store_true",
+        help="use fakeredis instead of REDIS_URL (in-process only)",
+    )
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(
+            baseline["routes"], results["routes"], args.max_regression
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Latency of /posts/search on a seeded corpus.
+
+Seeds posts for a dedicated benchmark author into the database configured by
+DATABASE_URL_ASYNC (migrations must be applied), then times the search query
+used by the endpoint against a leading-wildcard ILIKE baseline:
+
+    python -m benchmarks.search --posts 1000000 --queries 200
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import desc, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.api.v1.routers.posts import build_prefix_tsquery, build_search_query
+from app.config import get_settings
+from app.ids import new_id
+from app.models import Post, User
+from benchmarks.stats import percentiles
+
+BENCH_EMAIL = "search-benchmark@connector.rocks"
+VOCABULARY_SIZE = 20_000
+WORDS_PER_POST = (5, 40)
+COPY_BATCH_SIZE = 50_000
+
+
+def make_vocabulary(rng: random.Random) -> list[str]:
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choices(alphabet, k=rng.randint(3, 10))))
+    return sorted(words)
+
+
+async def seed(engine, total: int, vocabulary: list[str], rng: random.Random):
+    # Zipf-like term frequencies so common terms match many rows
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+
+    async with engine.begin() as connection:
+        await connection.execute(
+            insert(User)
+            .values(id=uuid.uuid4(), email=BENCH_EMAIL, username="search_benchmark")
+            .on_conflict_do_nothing()
+        )
+        user_id = await connection.scalar(
+            select(User.id).where(User.email == BENCH_EMAIL)
+        )
+        existing = await connection.scalar(
+            select(func.count()).select_from(Post).where(Post.user_id == user_id)
+        )
+
+    started = datetime.now(timezone.utc) - timedelta(days=365)
+    remaining = total - existing
+    while remaining > 0:
+        batch = min(remaining, COPY_BATCH_SIZE)
+        records = []
+        for _ in range(batch):
+            created_at = started + timedelta(seconds=rng.uniform(0, 365 * 86400))
+            content = " ".join(
+                rng.choices(vocabulary, weights, k=rng.randint(*WORDS_PER_POST))
+            )
+            records.append(
+                (new_id(), created_at, created_at, content, [], 0, False, user_id)
+            )
+
+        async with engine.begin() as connection:
+            raw = await connection.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                "posts",
+                records=records,
+                columns=[
+                    "id",
+                    "created_at",
+                    "updated_at",
+                    "content",
+                    "media",
+                    "likes",
+                    "edited",
+                    "user_id",
+                ],
+            )
+        remaining -= batch
+        print(f"seeded {total - remaining}/{total} posts", flush=True)
+
+    async with engine.connect() as connection:
+        await connection.execution_options(isolation_level="AUTOCOMMIT")
+        await connection.exec_driver_sql("ANALYZE posts")
+
+
+async def time_query(session_factory, query) -> float:
+    # Includes ORM hydration, as the endpoint pays for it too
+    async with session_factory() as session:
+        start = time.perf_counter()
+        (await session.execute(query)).all()
+        return (time.perf_counter() - start) * 1000
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+    engine = create_async_engine(
+        get_settings().database_url_async,
+        connect_args={"server_settings": {"jit": "off"}},
+    )
+
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    if not args.skip_seed:
+        await seed(engine, args.posts, vocabulary, rng)
+
+    async with engine.connect() as connection:
+        corpus_size = await connection.scalar(select(func.count()).select_from(Post))
+
+    terms = {
+        "common_word": [rng.choice(vocabulary[:50]) for _ in range(args.queries)],
+        "rare_word": [rng.choice(vocabulary[-5000:]) for _ in range(args.queries)],
+        "prefix": [rng.choice(vocabulary)[:3] for _ in range(args.queries)],
+        "two_words": [
+            f"{rng.choice(vocabulary[:500])} {rng.choice(vocabulary[:500])}"
+            for _ in range(args.queries)
+        ],
+    }
+
+    results = {"corpus_posts": corpus_size, "scenarios": {}}
+    for name, texts in terms.items():
+        first_page, second_page = [], []
+        for text in texts:
+            tsquery = build_prefix_tsquery(text)
+            first_page.append(
+                await time_query(session_factory, build_search_query(tsquery, 11))
+            )
+
+            async with session_factory() as session:
+                rows = (await session.execute(build_search_query(tsquery, 10))).all()
+            if len(rows) == 10:
+                last_post, last_rank = rows[-1]
+                second_page.append(
+                    await time_query(
+                        session_factory,
+                        build_search_query(tsquery, 11, (last_rank, last_post.id)),
+                    )
+                )
+
+        results["scenarios"][name] = {
+            "first_page": percentiles(first_page),
+            "next_page": percentiles(second_page) if second_page else None,
+        }
+
+        baseline = []
+        for text in texts[: args.baseline_queries]:
+            baseline.append(
+                await time_query(
+                    session_factory,
+                    select(Post)
+                    .where(Post.content.ilike(f"%{text.split()[0]}%"))
+                    .order_by(desc(Post.created_at))
+                    .limit(11),
+                )
+            )
+        results["scenarios"][name]["ilike_baseline"] = percentiles(baseline)
+
+    await engine.dispose()
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--baseline-queries", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--output")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
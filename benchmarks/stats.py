@@ -0,0 +1,42 @@
+import statistics
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0}
+    if len(ordered) < 2:
+        ordered = ordered * 2
+    quantiles = statistics.quantiles(ordered, n=100, method="inclusive")
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(quantiles[49], 3),
+        "p95_ms": round(quantiles[94], 3),
+        "p99_ms": round(quantiles[98], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def compare(
+    baseline: dict[str, dict], current: dict[str, dict], max_regression: float
+) -> list[str]:
+    """Return a line per route whose p95 latency or error rate got worse."""
+    regressions = []
+    for route, result in current.items():
+        before = baseline.get(route)
+        if not before or not before.get("p95_ms") or not result.get("p95_ms"):
+            continue
+
+        change = result["p95_ms"] / before["p95_ms"] - 1
+        if change > max_regression:
+            regressions.append(
+                f"{route}: p95 {before['p95_ms']}ms -> {result['p95_ms']}ms "
+                f"(+{change:.0%})"
+            )
+        if result.get("error_rate", 0) > before.get("error_rate", 0) + 0.01:
+            regressions.append(
+                f"{route}: error rate {before.get('error_rate', 0):.2%} -> "
+                f"{result['error_rate']:.2%}"
+            )
+    return regressions
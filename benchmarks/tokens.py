@@ -0,0 +1,87 @@
+"""Sign/verify throughput of login tokens per JWT algorithm.
+
+Compares passing PEM strings to PyJWT on every call (the previous behaviour)
+with reusing key objects parsed once, as app.jwt now does:
+
+    python -m benchmarks.tokens --seconds 2
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+ALGORITHMS = {
+    "RS256": lambda: rsa.generate_private_key(public_exponent=65537, key_size=2048),
+    "ES256": lambda: ec.generate_private_key(ec.SECP256R1()),
+    "EdDSA": ed25519.Ed25519PrivateKey.generate,
+}
+
+
+def ops_per_second(operation, seconds: float) -> float:
+    operations = 0
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        operation()
+        operations += 1
+    return round(operations / (time.perf_counter() - start), 1)
+
+
+def benchmark(algorithm: str, seconds: float) -> dict[str, float]:
+    private_key = ALGORITHMS[algorithm]()
+    public_key = private_key.public_key()
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    public_pem = public_key.public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+
+    payload = {
+        "sub": "benchmark@connector.rocks",
+        "exp": datetime.now(timezone.utc) + timedelta(hours=1),
+    }
+    token = jwt.encode(payload, private_key, algorithm=algorithm)
+
+    return {
+        "sign_pem": ops_per_second(
+            lambda: jwt.encode(payload, private_pem, algorithm=algorithm), seconds
+        ),
+        "sign_preloaded": ops_per_second(
+            lambda: jwt.encode(payload, private_key, algorithm=algorithm), seconds
+        ),
+        "verify_pem": ops_per_second(
+            lambda: jwt.decode(token, public_pem, algorithms=[algorithm]), seconds
+        ),
+        "verify_preloaded": ops_per_second(
+            lambda: jwt.decode(token, public_key, algorithms=[algorithm]), seconds
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = {
+        algorithm: benchmark(algorithm, args.seconds) for algorithm in ALGORITHMS
+    }
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()